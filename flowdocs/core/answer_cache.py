@@ -0,0 +1,153 @@
+# answer_cache.py
+"""
+Shared answer cache for search_query / search_stream.
+
+Keys are stable sha256 hashes of the normalized question plus the set of
+folders that were searched, so the same question asked by different users
+(who see the same corpus) maps to one entry in every worker. The backend is
+the "answers" alias in settings.CACHES: Redis (LRU + TTL) when REDIS_URL is
+set, a file-based cache otherwise. Hits and misses are counted in the cache.
+Error answers (OpenAI failures, a missing API key) and answers citing no
+PDF ("Sorry, no relevant documents") are never cached: nothing would retire
+them when a matching PDF is uploaded.
+
+Each entry also records the version of every PDF it cites and of every
+folder that was searched. A PDF's version is replaced when the PDF changes or
+is deleted, a folder's when a PDF in it gains or changes text (core/signals.py,
+bulk_ingest_pdfs), and entries holding an older version are treated as misses.
+"""
+import hashlib
+import json
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .utils import NO_API_KEY_MESSAGE
+
+ANSWER_CACHE_ALIAS = "answers" if "answers" in settings.CACHES else "default"
+ANSWER_CACHE_TTL = getattr(settings, "ANSWER_CACHE_TTL", 3600)  # 1 hour
+KEY_PREFIX = "answer:v5:"  # v5: only answers citing PDFs, with PDF and folder versions
+PDF_VERSION_PREFIX = "answer:pdf:"
+FOLDER_VERSION_PREFIX = "answer:folder:"
+HITS_KEY = "answer:stats:hits"
+MISSES_KEY = "answer:stats:misses"
+
+
+def get_answer_cache():
+    return caches[ANSWER_CACHE_ALIAS]
+
+
+def normalize_query(query: str) -> str:
+    """
+    Case-fold, collapse whitespace and drop trailing punctuation.
+    """
+    query = re.sub(r"\s+", " ", query.casefold()).strip()
+    return query.rstrip("?!.।, ")
+
+
+def is_cacheable(result: dict) -> bool:
+    """
+    False for error answers, which must stay with the user who got them, and
+    for answers without references, which no PDF version would invalidate.
+    """
+    answer = result.get("answer", "")
+    return bool(result.get("references")) and "[OpenAI Error]" not in answer and NO_API_KEY_MESSAGE not in answer
+
+
+def answer_cache_key(query: str, folder_ids) -> str:
+    payload = json.dumps(
+        {"q": normalize_query(query), "folders": sorted(set(folder_ids))},
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return KEY_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _count(key: str) -> None:
+    cache = get_answer_cache()
+    try:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
+    except ValueError:
+        # evicted between add and incr; losing one count is fine
+        pass
+
+
+# ---------------- PDF and folder versions ----------------
+def pdf_version_key(pdf_id) -> str:
+    return f"{PDF_VERSION_PREFIX}{pdf_id}"
+
+
+def folder_version_key(folder_id) -> str:
+    return f"{FOLDER_VERSION_PREFIX}{folder_id}"
+
+
+def entry_version_keys(result: dict, folder_ids) -> list:
+    """
+    Version keys an entry depends on: the PDFs it cites and the folders searched.
+    """
+    keys = [pdf_version_key(ref["id"]) for ref in result.get("references", []) if ref.get("id") is not None]
+    keys.extend(folder_version_key(folder_id) for folder_id in sorted(set(folder_ids)))
+    return list(dict.fromkeys(keys))
+
+
+def invalidate_pdf(pdf_id) -> None:
+    """
+    Retire every cached answer that cites this PDF by giving it a new version.
+    """
+    get_answer_cache().set(pdf_version_key(pdf_id), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_folder(folder_id) -> None:
+    """
+    Retire every cached answer searched over this folder, e.g. once a new PDF
+    in it can be found.
+    """
+    get_answer_cache().set(folder_version_key(folder_id), uuid.uuid4().hex, timeout=None)
+
+
+# ---------------- Entries ----------------
+async def aget_answer(key: str):
+    """
+    Return the cached result dict or None, updating the hit/miss counters.
+    An entry citing a PDF, or searched over a folder, that changed since it
+    was stored is a miss.
+    """
+    cache = get_answer_cache()
+    entry = await cache.aget(key)
+    result = None
+    if entry is not None:
+        versions = entry["versions"]
+        if await cache.aget_many(list(versions)) == versions:
+            result = entry["result"]
+    await _count(HITS_KEY if result is not None else MISSES_KEY)
+    return result
+
+
+async def aset_answer(key: str, result: dict, folder_ids) -> None:
+    cache = get_answer_cache()
+    version_keys = entry_version_keys(result, folder_ids)
+    for version_key in version_keys:
+        await cache.aadd(version_key, uuid.uuid4().hex, timeout=None)
+    versions = await cache.aget_many(version_keys) if version_keys else {}
+    if not versions or len(versions) < len(version_keys):
+        return  # a version was evicted meanwhile; the entry could not be checked
+    await cache.aset(key, {"result": result, "versions": versions}, timeout=ANSWER_CACHE_TTL)
+
+
+def stats() -> dict:
+    cache = get_answer_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "backend": settings.CACHES[ANSWER_CACHE_ALIAS]["BACKEND"],
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def reset_stats() -> None:
+    get_answer_cache().delete_many([HITS_KEY, MISSES_KEY])
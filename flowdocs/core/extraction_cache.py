@@ -0,0 +1,122 @@
+# extraction_cache.py
+"""
+Content-addressed cache in front of PDF extraction.
+
+The sha256 of the file bytes maps to the per-page text, whether OCR was
+needed, the detected language and the YAKE keywords (ExtractionCache rows).
+Ingestion and the restore commands go through extract_document() (bulk
+ingest looks entries up in batches), so a file whose bytes were seen before
+never pays for PyMuPDF, EasyOCR or YAKE again, whatever its name or folder. Extractions where OCR failed on some
+page (a crashed worker, a page EasyOCR could not read) are not stored, so
+those pages are OCR'd again on the next attempt; pages where OCR ran but
+found no text are stored like any other.
+"""
+import hashlib
+
+from django.db import IntegrityError
+
+from .models import ExtractionCache
+
+EXTRACTION_CACHE_VERSION = 1  # bump to invalidate rows built by an older extractor
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_fields(file_path: str, with_keywords: bool = True) -> dict:
+    """
+    Run the actual extraction (no cache, no database access), returning the
+    ExtractionCache field values plus ocr_failed_pages (see new_entry).
+    Safe to call from worker processes.
+    """
+    from .utils import read_pdf_pages, keyword_language, extract_keywords
+
+    pages, ocr_pages, ocr_failed_pages = read_pdf_pages(file_path)
+    text = "\n".join(page for page in pages if page).strip()
+    language = keyword_language(text) if text else ""
+    keywords = None
+    if with_keywords:
+        keywords = extract_keywords(text, language or None) if text else []
+    return {
+        "pages": pages,
+        "used_ocr": bool(ocr_pages),
+        "ocr_pages": list(ocr_pages),
+        "language": language,
+        "keywords": keywords,
+        "ocr_failed_pages": list(ocr_failed_pages),
+    }
+
+
+def new_entry(content_hash: str, fields: dict) -> ExtractionCache:
+    """
+    Unsaved ExtractionCache for the result of extract_fields().
+    """
+    fields = dict(fields)
+    ocr_failed_pages = fields.pop("ocr_failed_pages", [])
+    entry = ExtractionCache(content_hash=content_hash, version=EXTRACTION_CACHE_VERSION, **fields)
+    entry.ocr_failed_pages = ocr_failed_pages
+    return entry
+
+
+def keywords_for(text: str, language: str = None) -> list:
+    """
+    Keywords for a cached entry that was stored without them (worker-safe).
+    """
+    from .utils import extract_keywords
+
+    return extract_keywords(text, language or None) if text else []
+
+
+def extract_document(file_path: str, with_keywords: bool = True, content_hash: str = None) -> ExtractionCache:
+    """
+    Return the (possibly cached) extraction of a PDF file.
+    Keywords are only computed when with_keywords is set and the cached row
+    has none yet. Empty or incomplete extractions (see
+    ExtractionCache.complete) are returned unsaved, so a file that failed
+    to open or OCR is retried next time.
+    """
+    content_hash = content_hash or file_sha256(file_path)
+    entry = ExtractionCache.objects.filter(
+        content_hash=content_hash, version=EXTRACTION_CACHE_VERSION
+    ).first()
+
+    changed = entry is None
+    if entry is None:
+        entry = new_entry(content_hash, extract_fields(file_path, with_keywords))
+        if entry.ocr_failed_pages:
+            print(f"[⚠️] OCR failed on pages {entry.ocr_failed_pages} of {file_path}; not caching the extraction")
+    else:
+        print(f"[♻️] Extraction cache hit for {file_path} ({content_hash[:12]})")
+        if with_keywords and entry.keywords is None:
+            entry.keywords = keywords_for(entry.text, entry.language)
+            changed = True
+
+    if changed and entry.complete:
+        save_entry(entry)
+    return entry
+
+
+def save_entry(entry: ExtractionCache) -> None:
+    """
+    Upsert by content hash; another worker may have stored the same file meanwhile.
+    """
+    fields = {
+        "version": entry.version,
+        "pages": entry.pages,
+        "used_ocr": entry.used_ocr,
+        "ocr_pages": entry.ocr_pages,
+        "language": entry.language,
+        "keywords": entry.keywords,
+    }
+    try:
+        entry.pk = ExtractionCache.objects.update_or_create(
+            content_hash=entry.content_hash, defaults=fields
+        )[0].pk
+    except IntegrityError:
+        ExtractionCache.objects.filter(content_hash=entry.content_hash).update(**fields)
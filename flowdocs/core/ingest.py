@@ -0,0 +1,145 @@
+# ingest.py
+"""
+Background ingestion pipeline for uploaded PDFs.
+
+After an upload is committed the PDF is queued on a small thread pool, which
+extracts its text (PyMuPDF, EasyOCR for pages without a text layer), runs
+YAKE over it, stores the pages (core/pages.py) and keywords, writes page-level chunks
+to the Chroma vector store and stores a web-optimized copy of the file
+(core/optimize.py). Files whose bytes were extracted before are
+served from the extraction cache (core/extraction_cache.py). The upload request returns immediately;
+PDFFile.status tracks pending → processing → done/failed.
+
+The thread pool lives in memory, so a restart or deploy loses its queue.
+The status column is the durable record: the ingest_pending_pdfs command
+puts rows left in processing back to pending and ingests every pending row,
+and with --failed retries failed ones too.
+
+With INGEST_BACKEND = "worker" (what start.sh uses) uploads are only left
+pending, and one dedicated `ingest_pending_pdfs --watch` process ingests
+them. Web workers then never start ingestion threads or an OCR pool, so the
+OCR_WORKERS processes (core/ocr.py) are the machine-wide total instead of
+one pool per web worker.
+"""
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import PDFFile
+
+INGEST_WORKERS = getattr(settings, "INGEST_WORKERS", 2)
+INGEST_ASYNC = getattr(settings, "INGEST_ASYNC", True)
+INGEST_BACKEND = getattr(settings, "INGEST_BACKEND", "threads")  # "threads" or "worker"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Create the process-wide ingestion pool on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=INGEST_WORKERS, thread_name_prefix="pdf-ingest"
+                )
+    return _executor
+
+
+# ---------------- Ingestion Stage ----------------
+def claim_pdf(pdf_id: int) -> bool:
+    """
+    Move a pending or failed PDF to processing. False when another worker
+    already has it (or it is done), so each PDF is ingested once.
+    """
+    return bool(
+        PDFFile.objects.filter(pk=pdf_id, status__in=[PDFFile.STATUS_PENDING, PDFFile.STATUS_FAILED])
+        .update(status=PDFFile.STATUS_PROCESSING)
+    )
+
+
+def requeue_stalled(include_failed: bool = False) -> int:
+    """
+    Put PDFs left in processing by a worker that died (restart, deploy, OOM)
+    back to pending, and failed ones too with include_failed. Only safe while
+    no ingestion is running, i.e. at startup. Returns the number of rows reset.
+    """
+    statuses = [PDFFile.STATUS_PROCESSING] + ([PDFFile.STATUS_FAILED] if include_failed else [])
+    return PDFFile.objects.filter(status__in=statuses).update(status=PDFFile.STATUS_PENDING)
+
+
+def ingest_pdf(pdf_id: int) -> None:
+    """
+    Extract text and keywords for one PDFFile and persist them.
+    Runs on a pool thread, so it manages its own database connection.
+    """
+    from .extraction_cache import extract_document
+    from .optimize import PDF_OPTIMIZE_ENABLED, optimize_pdf_file
+    from .pages import set_pages
+    from .vectorstore import index_pdf_chunks
+
+    close_old_connections()
+    try:
+        pdf = PDFFile.objects.filter(pk=pdf_id).first()
+        if pdf is None or not claim_pdf(pdf_id):
+            return
+        if not pdf.file:
+            PDFFile.objects.filter(pk=pdf_id).update(status=PDFFile.STATUS_FAILED)
+            return
+
+        print(f"[⚙️] Ingesting PDF {pdf_id}: {pdf.file.name}")
+
+        try:
+            extracted = extract_document(pdf.file.path)
+            pages = extracted.pages
+            keywords = extracted.keywords or []
+        except Exception as e:
+            print(f"[❌] Ingestion failed for PDF {pdf_id}: {e}")
+            traceback.print_exc()
+            PDFFile.objects.filter(pk=pdf_id).update(status=PDFFile.STATUS_FAILED)
+            return
+
+        with transaction.atomic():
+            set_pages(pdf, pages, extracted.ocr_pages)
+            pdf.keywords = keywords
+            pdf.content_hash = extracted.content_hash
+            # the text found so far is kept and searchable; `ingest_pending_pdfs --failed` retries the OCR
+            pdf.status = PDFFile.STATUS_FAILED if extracted.ocr_failed_pages else PDFFile.STATUS_DONE
+            pdf.save(update_fields=["page_count", "char_count", "keywords", "content_hash", "status"])
+        print(f"[✅] Ingested PDF {pdf_id}: {pdf.page_count} pages, {pdf.char_count} chars, {len(keywords)} keywords")
+
+        # Semantic chunks are an optional extra; never fail ingestion over them
+        try:
+            index_pdf_chunks(pdf, pages)
+        except Exception as e:
+            print(f"[❌] Chunk embedding failed for PDF {pdf_id}: {e}")
+
+        # So is the web-optimized copy; the original keeps being served without it
+        if PDF_OPTIMIZE_ENABLED:
+            try:
+                optimize_pdf_file(pdf)
+            except Exception as e:
+                print(f"[❌] PDF optimization failed for PDF {pdf_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def enqueue_pdf(pdf: PDFFile) -> None:
+    """
+    Schedule ingestion for a PDFFile once the surrounding transaction commits.
+    With INGEST_ASYNC = False the work runs inline (useful for tests and scripts);
+    with INGEST_BACKEND = "worker" the pending row is left to the ingest process.
+    """
+    pdf_id = pdf.pk
+    if INGEST_BACKEND == "worker":
+        print(f"[⚙️] PDF {pdf_id} queued for the ingest worker")
+    elif INGEST_ASYNC:
+        transaction.on_commit(lambda: get_executor().submit(ingest_pdf, pdf_id))
+    else:
+        transaction.on_commit(lambda: ingest_pdf(pdf_id))
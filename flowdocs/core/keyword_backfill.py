@@ -0,0 +1,110 @@
+# keyword_backfill.py
+"""
+Parallel keyword backfill behind the extract_keywords commands.
+
+Document texts (optionally only the pages within max_chars) are sent in
+batches to a process pool. Each worker keeps one YAKE extractor per language
+(core/registry.py) and detects the language on a bounded sample. While the
+pool works on the next batch, the finished one is written with a single
+bulk_update(fields=['keywords']). bulk_update does not fire post_save, so the
+batch is then re-indexed and its cached answers are invalidated here, as
+core/signals.py would do for a keywords save.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+from .models import PDFFile
+from .pages import document_texts
+from .search_backends import update_search_vector
+from .search_index import index_pdf
+from .signals import invalidate_cached_answers
+
+KEYWORD_BATCH_SIZE = 200
+
+
+def pdfs_needing_keywords(include_done: bool = False):
+    """
+    PDFs with text content; unless include_done, only those without keywords.
+    """
+    pdfs = PDFFile.objects.filter(char_count__gt=0)
+    if not include_done:
+        pdfs = pdfs.filter(keywords__isnull=True) | pdfs.filter(keywords=[])
+    return pdfs
+
+
+def keyword_job(job: tuple) -> tuple:
+    """
+    Worker side: (pdf_id, text) → (pdf_id, keywords or None on failure, chars).
+    """
+    from .utils import extract_keywords
+
+    pdf_id, text = job
+    try:
+        return pdf_id, extract_keywords(text), len(text)
+    except Exception as e:
+        print(f"[❌] Keyword extraction failed for PDF {pdf_id}: {e}")
+        return pdf_id, None, len(text)
+
+
+def load_texts(pdf_ids: list, max_chars: int = None) -> list:
+    """
+    [(pdf_id, text)] for a batch; with max_chars only the pages within that
+    prefix leave the database.
+    """
+    return list(document_texts(pdf_ids, max_chars).items())
+
+
+def write_keywords(results: list) -> tuple:
+    """
+    Persist one finished batch. Returns (written, errors).
+    """
+    updates = [PDFFile(id=pdf_id, keywords=keywords) for pdf_id, keywords, _ in results if keywords is not None]
+    PDFFile.objects.bulk_update(updates, fields=['keywords'])
+
+    pdfs = PDFFile.objects.filter(id__in=[pdf.id for pdf in updates]).only('id', 'keywords').prefetch_related('pages')
+    for pdf in pdfs:
+        index_pdf(pdf)
+    update_search_vector([pdf.id for pdf in updates])
+    for pdf in updates:
+        invalidate_cached_answers(pdf.id)
+    return len(updates), len(results) - len(updates)
+
+
+def backfill_keywords(pdf_ids: list, max_chars: int = None, workers: int = None,
+                      batch_size: int = KEYWORD_BATCH_SIZE, log=print) -> dict:
+    """
+    Extract and store keywords for pdf_ids. Returns processed/errors/chars/seconds.
+    """
+    workers = workers or os.cpu_count() or 1
+    batches = [pdf_ids[i:i + batch_size] for i in range(0, len(pdf_ids), batch_size)]
+    stats = {"processed": 0, "errors": 0, "chars": 0, "seconds": 0.0}
+    started = time.monotonic()
+
+    def submit(pool, batch):
+        jobs = load_texts(batch, max_chars)
+        # Workers never touch the database; don't hand them our connections
+        connections.close_all()
+        return [pool.submit(keyword_job, job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = submit(pool, batches[0]) if batches else []
+        for i in range(len(batches)):
+            results = [future.result() for future in pending]
+            # Keep the pool busy with the next batch while this one is written
+            pending = submit(pool, batches[i + 1]) if i + 1 < len(batches) else []
+
+            written, errors = write_keywords(results)
+            stats["processed"] += written
+            stats["errors"] += errors
+            stats["chars"] += sum(chars for _, _, chars in results)
+
+            elapsed = time.monotonic() - started
+            done = stats["processed"] + stats["errors"]
+            log(f"  {done}/{len(pdf_ids)} PDFs, {done / elapsed:.2f} PDFs/sec, "
+                f"{stats['chars'] / elapsed / 1000:.0f}k chars/sec")
+
+    stats["seconds"] = time.monotonic() - started
+    return stats
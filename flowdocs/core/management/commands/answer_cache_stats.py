@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from core.answer_cache import stats, reset_stats
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the shared answer cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after printing them'
+        )
+
+    def handle(self, *args, **options):
+        s = stats()
+        self.stdout.write(f"Backend:  {s['backend']}")
+        self.stdout.write(f"Hits:     {s['hits']}")
+        self.stdout.write(f"Misses:   {s['misses']}")
+        self.stdout.write(self.style.SUCCESS(f"Hit rate: {s['hit_rate']:.1%}"))
+
+        if options['reset']:
+            reset_stats()
+            self.stdout.write("Counters reset")
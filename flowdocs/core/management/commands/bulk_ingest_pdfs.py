@@ -0,0 +1,289 @@
+from django.core.management.base import BaseCommand
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.conf import settings
+from django.db import connections, transaction
+from core import ocr
+from core.models import PDFFile, PDFPage, CustomUser, Folder, ExtractionCache
+from core.extraction_cache import EXTRACTION_CACHE_VERSION, file_sha256, extract_fields, keywords_for, new_entry
+from core.pages import PAGE_BATCH_SIZE, build_pages, page_aggregates
+from core.search_index import index_pdf
+from core.search_backends import update_search_vector
+from core.signals import invalidate_folder_answers
+from core.vectorstore import index_pdf_chunks
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+import time
+
+CHECKPOINT_NAME = '.bulk_ingest_checkpoint'
+
+
+def init_worker():
+    # Files are already spread over the pool; OCR each file's pages inline
+    # instead of every worker starting its own OCR pool.
+    ocr.OCR_WORKERS = 0
+
+
+def run_parallel(pool, fn, items, *args) -> list:
+    """
+    Run fn(item, *args) on the pool; returns the results in item order, with
+    the exception in place of the result for items that failed.
+    """
+    futures = [pool.submit(fn, item, *args) for item in items]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Ingest a directory tree of PDFs in parallel (extraction, OCR, keywords) with resumable progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'directory',
+            nargs='?',
+            default='media/pdfs',
+            help='Directory to scan recursively for *.pdf (default: media/pdfs)'
+        )
+        parser.add_argument(
+            '--folder-id',
+            type=int,
+            default=22,  # Default to Audit folder
+            help='Folder ID to assign PDFs to (default: 22 for Audit)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Extraction worker processes (default: number of CPU cores)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Files extracted and written per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--skip-keywords',
+            action='store_true',
+            help='Skip keyword extraction to speed up process'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help=f'Checkpoint file listing finished files (default: <directory>/{CHECKPOINT_NAME})'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from the beginning'
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory']).resolve()
+        folder_id = options['folder_id']
+        with_keywords = not options['skip_keywords']
+        batch_size = max(options['batch_size'], 1)
+
+        try:
+            folder = Folder.objects.get(id=folder_id)
+            self.stdout.write(f"Using folder: {folder.name} (ID: {folder_id})")
+        except Folder.DoesNotExist:
+            self.stdout.write(self.style.ERROR(f"Folder with ID {folder_id} not found"))
+            return
+
+        # Get the first superadmin user
+        user = CustomUser.objects.filter(role='superadmin').first() or CustomUser.objects.first()
+        if not user:
+            self.stdout.write(self.style.ERROR("No users found in database"))
+            return
+        self.stdout.write(f"Using user: {user.username}")
+
+        if not directory.is_dir():
+            self.stdout.write(self.style.ERROR(f"PDF directory not found: {directory}"))
+            return
+
+        # ---------------- Resume from checkpoint ----------------
+        checkpoint = Path(options['checkpoint'] or directory / CHECKPOINT_NAME)
+        if options['restart'] and checkpoint.exists():
+            checkpoint.unlink()
+        finished = set(checkpoint.read_text(encoding='utf-8').splitlines()) if checkpoint.exists() else set()
+
+        pdf_paths = sorted(path for path in directory.rglob('*') if path.suffix.lower() == '.pdf' and path.is_file())
+        pending = [path for path in pdf_paths if str(path.relative_to(directory)) not in finished]
+        self.stdout.write(
+            f"Found {len(pdf_paths)} PDF files, {len(pdf_paths) - len(pending)} already done, {len(pending)} to ingest"
+        )
+        if not pending:
+            return
+
+        # One query each instead of an exists() per file. Web-optimized copies
+        # (media/pdfs/optimized/) are known too, or the default directory
+        # would ingest each of them as a new document.
+        self.known_files = set()
+        for name, optimized_name in PDFFile.objects.values_list('file', 'optimized_file'):
+            self.known_files.update(filter(None, (name, optimized_name)))
+        self.known_hashes = set()
+        for content_hash, optimized_hash in PDFFile.objects.filter(folder=folder).values_list('content_hash', 'optimized_hash'):
+            self.known_hashes.update(filter(None, (content_hash, optimized_hash)))
+        self.media_root = Path(settings.MEDIA_ROOT).resolve()
+
+        restored_count = 0
+        skipped_count = 0
+        error_count = 0
+        started = time.monotonic()
+
+        # Workers never touch the database; don't hand them our connections
+        connections.close_all()
+        self.stdout.write(f"Starting {options['workers']} extraction workers")
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                done, restored, skipped, errors = self.ingest_batch(pool, batch, folder, user, with_keywords)
+                restored_count += restored
+                skipped_count += skipped
+                error_count += errors
+
+                # Only files whose rows are committed are checkpointed
+                if done:
+                    with open(checkpoint, 'a', encoding='utf-8') as f:
+                        f.writelines(f"{path.relative_to(directory)}\n" for path in done)
+
+                processed = start + len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"  {processed}/{len(pending)} files, {processed / elapsed:.2f} files/sec"
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nBulk ingest complete: {restored_count} PDFs restored, {skipped_count} skipped, "
+                f"{error_count} errors in {elapsed:.1f}s ({len(pending) / elapsed:.2f} files/sec)"
+            )
+        )
+
+    def storage_name(self, path: Path) -> str:
+        """
+        Name of the file inside MEDIA_ROOT, or None when it lives elsewhere.
+        """
+        try:
+            return path.relative_to(self.media_root).as_posix()
+        except ValueError:
+            return None
+
+    def ingest_batch(self, pool, batch, folder, user, with_keywords):
+        """
+        Extract one batch in the pool and write it with bulk_create.
+        Returns (finished_paths, restored, skipped, errors).
+        """
+        finished, errors = [], 0
+
+        # Hash in the pool too: reading thousands of files is real work
+        hashes = run_parallel(pool, file_sha256, [str(path) for path in batch])
+        todo = []
+        for path, content_hash in zip(batch, hashes):
+            if isinstance(content_hash, Exception):
+                self.stdout.write(self.style.ERROR(f"✗ Failed to read {path.name}: {content_hash}"))
+                errors += 1
+            elif self.storage_name(path) in self.known_files or content_hash in self.known_hashes:
+                finished.append(path)
+            else:
+                self.known_hashes.add(content_hash)
+                todo.append((path, content_hash))
+        skipped = len(finished)
+
+        # ---------------- Extraction cache ----------------
+        cached = {
+            entry.content_hash: entry
+            for entry in ExtractionCache.objects.filter(
+                content_hash__in=[content_hash for _, content_hash in todo], version=EXTRACTION_CACHE_VERSION
+            )
+        }
+        misses = {content_hash: path for path, content_hash in todo if content_hash not in cached}
+        extracted = run_parallel(pool, extract_fields, [str(path) for path in misses.values()], with_keywords)
+        failures = {}
+
+        new_entries = {}
+        for content_hash, fields in zip(misses, extracted):
+            if isinstance(fields, Exception):
+                failures[content_hash] = fields
+                continue
+            new_entries[content_hash] = new_entry(content_hash, fields)
+        # Extractions with failed OCR pages are not cached, so the pages are retried
+        ExtractionCache.objects.bulk_create(
+            [entry for entry in new_entries.values() if entry.complete], ignore_conflicts=True
+        )
+        cached.update(new_entries)
+
+        if with_keywords:
+            missing = [entry for entry in cached.values() if entry.keywords is None]
+            keywords = run_parallel(pool, keywords_for, [entry.text for entry in missing])
+            for entry, result in zip(missing, keywords):
+                entry.keywords = [] if isinstance(result, Exception) else result
+            # bulk_create(ignore_conflicts=True) leaves pk unset; write through the saved rows
+            saved = ExtractionCache.objects.filter(
+                content_hash__in=[entry.content_hash for entry in missing], version=EXTRACTION_CACHE_VERSION
+            )
+            for row in saved:
+                row.keywords = cached[row.content_hash].keywords
+            ExtractionCache.objects.bulk_update(saved, ['keywords'])
+
+        # ---------------- PDFFile rows ----------------
+        rows, row_paths = [], []
+        for path, content_hash in todo:
+            entry = cached.get(content_hash)
+            if entry is None:
+                self.stdout.write(self.style.ERROR(f"✗ Failed to restore {path.name}: {failures.get(content_hash)}"))
+                self.known_hashes.discard(content_hash)
+                errors += 1
+                continue
+
+            name = self.storage_name(path)
+            if name is None:
+                with open(path, 'rb') as f:
+                    name = default_storage.save(f"pdfs/{path.name}", File(f))
+            rows.append(PDFFile(
+                title=path.stem.replace('_', ' ').title(),
+                file=name,
+                uploaded_by=user,
+                folder=folder,
+                keywords=entry.keywords or [],
+                content_hash=content_hash,
+                status=PDFFile.STATUS_DONE if entry.complete else PDFFile.STATUS_FAILED,
+                **page_aggregates(entry.pages),
+            ))
+            row_paths.append(path)
+
+        with transaction.atomic():
+            created = PDFFile.objects.bulk_create(rows)
+            PDFPage.objects.bulk_create(
+                [
+                    page
+                    for pdf in created
+                    for page in build_pages(pdf, cached[pdf.content_hash].pages, cached[pdf.content_hash].ocr_pages)
+                ],
+                batch_size=PAGE_BATCH_SIZE,
+            )
+            # bulk_create bypasses post_save, so index explicitly
+            for pdf in created:
+                index_pdf(pdf, text="\n".join(cached[pdf.content_hash].pages))
+            update_search_vector([pdf.pk for pdf in created])
+        if created:
+            # and retire the folder's cached answers, which the new PDFs may change
+            invalidate_folder_answers(folder.id)
+        self.known_files.update(pdf.file.name for pdf in created)
+        finished.extend(row_paths)
+
+        for pdf in created:
+            # Semantic chunks are an optional extra; never fail ingestion over them
+            try:
+                index_pdf_chunks(pdf, cached[pdf.content_hash].pages)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"✗ Chunk embedding failed for {pdf.title}: {str(e)}"))
+
+        return finished, len(created), skipped, errors
@@ -1,49 +1,58 @@
 from django.core.management.base import BaseCommand
-from core.models import PDFFile
-from core.utils import extract_keywords
+from core.keyword_backfill import KEYWORD_BATCH_SIZE, backfill_keywords, pdfs_needing_keywords
+import os
 
 class Command(BaseCommand):
-    help = 'Extract keywords for PDFs that have text content but no keywords'
+    help = 'Extract keywords for PDFs that have text content but no keywords (in parallel, batched writes)'
+    default_max_chars = 0
 
-    def handle(self, *args, **options):
-        # Find PDFs that have text content but no keywords
-        pdfs_with_text = PDFFile.objects.filter(
-            text_content__isnull=False
-        ).exclude(text_content='')
-        
-        pdfs_needing_keywords = pdfs_with_text.filter(keywords__isnull=True) | pdfs_with_text.filter(keywords=[])
-        
-        self.stdout.write(f"Found {pdfs_needing_keywords.count()} PDFs needing keyword extraction")
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-chars',
+            type=int,
+            default=self.default_max_chars,
+            help=f'Maximum characters to process per PDF, 0 = whole text (default: {self.default_max_chars})'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Keyword worker processes (default: number of CPU cores)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=KEYWORD_BATCH_SIZE,
+            help=f'PDFs per bulk_update batch (default: {KEYWORD_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-extract keywords for every PDF with text, not only those without keywords'
+        )
 
-        processed_count = 0
-        error_count = 0
+    def handle(self, *args, **options):
+        max_chars = options['max_chars']
 
-        for pdf in pdfs_needing_keywords:
-            try:
-                self.stdout.write(f"Processing {pdf.title}...")
-                
-                # Extract keywords
-                keywords = extract_keywords(pdf.text_content)
-                
-                # Update the PDF with keywords
-                pdf.keywords = keywords
-                pdf.save()
-                
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"✓ Extracted {len(keywords)} keywords for {pdf.title}"
-                    )
-                )
-                processed_count += 1
+        pdf_ids = list(pdfs_needing_keywords(options['all']).order_by('id').values_list('id', flat=True))
+        self.stdout.write(f"Found {len(pdf_ids)} PDFs needing keyword extraction")
+        if max_chars:
+            self.stdout.write(f"Processing max {max_chars} characters per PDF for efficiency")
+        if not pdf_ids:
+            return
 
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"✗ Failed to extract keywords for {pdf.title}: {str(e)}")
-                )
-                error_count += 1
+        stats = backfill_keywords(
+            pdf_ids,
+            max_chars=max_chars,
+            workers=options['workers'],
+            batch_size=max(options['batch_size'], 1),
+            log=self.stdout.write,
+        )
 
+        seconds = stats['seconds'] or 1e-9
         self.stdout.write(
             self.style.SUCCESS(
-                f"\nKeyword extraction complete: {processed_count} PDFs processed, {error_count} errors"
+                f"\nKeyword extraction complete: {stats['processed']} PDFs processed, {stats['errors']} errors "
+                f"in {stats['seconds']:.1f}s ({len(pdf_ids) / seconds:.2f} PDFs/sec)"
             )
         )
@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.ingest import ingest_pdf, requeue_stalled
+from core.models import PDFFile
+
+
+class Command(BaseCommand):
+    help = 'Ingest PDFs still pending (e.g. queued before a restart), resetting rows left in processing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--failed',
+            action='store_true',
+            help='Also retry PDFs whose ingestion failed'
+        )
+        parser.add_argument(
+            '--keep-processing',
+            action='store_true',
+            help='Leave rows in processing alone (use while web workers are ingesting)'
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running as the ingest worker, polling for new uploads (INGEST_BACKEND = "worker")'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between polls with --watch (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['keep_processing']:
+            reset = requeue_stalled(include_failed=options['failed'])
+            if reset:
+                self.stdout.write(f"Re-queued {reset} PDFs left in processing or failed")
+        elif options['failed']:
+            PDFFile.objects.filter(status=PDFFile.STATUS_FAILED).update(status=PDFFile.STATUS_PENDING)
+
+        if options['watch']:
+            self.stdout.write(f"Ingest worker polling for pending PDFs every {options['interval']}s")
+            while True:
+                close_old_connections()
+                if not self.ingest_pending(quiet=True):
+                    time.sleep(options['interval'])
+
+        self.ingest_pending()
+
+    def ingest_pending(self, quiet: bool = False) -> int:
+        """
+        Ingest every pending PDF, oldest first. Returns how many were pending.
+        """
+        pdf_ids = list(
+            PDFFile.objects.filter(status=PDFFile.STATUS_PENDING).order_by('uploaded_at').values_list('id', flat=True)
+        )
+        if quiet and not pdf_ids:
+            return 0
+        self.stdout.write(f"Ingesting {len(pdf_ids)} pending PDFs")
+
+        done_count = 0
+        failed_count = 0
+        for pdf_id in pdf_ids:
+            try:
+                ingest_pdf(pdf_id)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"✗ Failed to ingest PDF {pdf_id}: {str(e)}"))
+            status = PDFFile.objects.filter(pk=pdf_id).values_list('status', flat=True).first()
+            if status == PDFFile.STATUS_DONE:
+                done_count += 1
+            elif status == PDFFile.STATUS_FAILED:
+                failed_count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nIngestion complete: {done_count} PDFs done, {failed_count} failed, "
+                f"{len(pdf_ids) - done_count - failed_count} skipped"
+            )
+        )
+        return len(pdf_ids)
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from core.models import PDFFile
+from core.optimize import optimize_pdf_file
+
+
+class Command(BaseCommand):
+    help = 'Store web-optimized copies (downsampled images, deflated streams) of PDFs that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pdf-id',
+            type=int,
+            help='Only optimize this PDF'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-optimize PDFs that already have an optimized copy'
+        )
+
+    def handle(self, *args, **options):
+        pdfs = PDFFile.objects.exclude(file='').defer(*PDFFile.TEXT_FIELDS)
+        if options['pdf_id']:
+            pdfs = pdfs.filter(id=options['pdf_id'])
+        elif not options['all']:
+            pdfs = pdfs.filter(optimized_file='')
+
+        self.stdout.write(f"Optimizing {pdfs.count()} PDFs")
+
+        optimized_count = 0
+        kept_count = 0
+        error_count = 0
+        original_bytes = 0
+        optimized_bytes = 0
+
+        for pdf in pdfs.iterator():
+            try:
+                if optimize_pdf_file(pdf):
+                    optimized_count += 1
+                    original_bytes += pdf.original_size
+                    optimized_bytes += pdf.optimized_size
+                else:
+                    kept_count += 1
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"✗ Failed to optimize {pdf.title}: {str(e)}"))
+                error_count += 1
+
+        saved_mb = (original_bytes - optimized_bytes) / (1024 * 1024)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nOptimization complete: {optimized_count} PDFs optimized ({saved_mb:.1f} MB saved), "
+                f"{kept_count} kept as uploaded, {error_count} errors"
+            )
+        )
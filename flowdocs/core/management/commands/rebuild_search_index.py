@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from core.models import PDFFile
+from core.pages import update_search_text
+from core.search_index import index_pdf
+from core.search_backends import update_search_vector
+from core.vectorstore import index_pdf_chunks
+
+class Command(BaseCommand):
+    help = 'Rebuild normalized page search text, the inverted search index (postings) and PostgreSQL search vectors from stored pages and keywords'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pdf-id',
+            type=int,
+            help='Only re-index this PDF'
+        )
+        parser.add_argument(
+            '--vectors',
+            action='store_true',
+            help='Also re-embed page chunks into the Chroma vector store'
+        )
+
+    def handle(self, *args, **options):
+        pdfs = PDFFile.objects.only('id', 'title', 'folder_id', 'keywords').prefetch_related('pages')
+        if options['pdf_id']:
+            pdfs = pdfs.filter(id=options['pdf_id'])
+
+        self.stdout.write(f"Indexing {pdfs.count()} PDFs")
+
+        indexed_count = 0
+        posting_count = 0
+        error_count = 0
+
+        for pdf in pdfs.iterator(chunk_size=100):
+            try:
+                update_search_text(pdf)
+                posting_count += index_pdf(pdf)
+                if options['vectors']:
+                    index_pdf_chunks(pdf, [page.text for page in pdf.pages.all()])
+                indexed_count += 1
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f"✗ Failed to index {pdf.title}: {str(e)}")
+                )
+                error_count += 1
+
+        # tsvectors are computed inside PostgreSQL in a single UPDATE (no-op on SQLite)
+        update_search_vector(pdfs.values_list('id', flat=True))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nIndexing complete: {indexed_count} PDFs, {posting_count} postings, {error_count} errors"
+            )
+        )
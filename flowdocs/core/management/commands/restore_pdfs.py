@@ -1,7 +1,10 @@
 from django.core.management.base import BaseCommand
 from django.core.files import File
+from django.db import transaction
 from core.models import PDFFile, CustomUser, Folder
-from core.utils import extract_text_from_pdf, extract_keywords
+from core.extraction_cache import extract_document
+from core.pages import set_pages
+from core.vectorstore import index_pdf_chunks
 import os
 from pathlib import Path
 
@@ -57,19 +60,32 @@ class Command(BaseCommand):
             try:
                 # Extract text and keywords
                 self.stdout.write(f"Processing {pdf_path.name}...")
-                text_content = extract_text_from_pdf(str(pdf_path))
-                keywords = extract_keywords(text_content) if text_content else []
+                # Cached by content hash: known files are not re-extracted
+                extracted = extract_document(str(pdf_path))
+                keywords = extracted.keywords or []
 
-                # Create PDFFile object
-                with open(pdf_path, 'rb') as f:
-                    pdf_file = PDFFile(
-                        title=pdf_path.stem.replace('_', ' ').title(),
-                        uploaded_by=user,
-                        folder=folder,
-                        text_content=text_content,
-                        keywords=keywords
-                    )
-                    pdf_file.file.save(pdf_path.name, File(f), save=True)
+                # Create the PDFFile row, then its pages; the one save with
+                # page_count / char_count / keywords indexes it (core/signals.py)
+                with transaction.atomic():
+                    with open(pdf_path, 'rb') as f:
+                        pdf_file = PDFFile(
+                            title=pdf_path.stem.replace('_', ' ').title(),
+                            uploaded_by=user,
+                            folder=folder,
+                            content_hash=extracted.content_hash,
+                            status=PDFFile.STATUS_FAILED if extracted.ocr_failed_pages else PDFFile.STATUS_DONE,
+                        )
+                        pdf_file.file.save(pdf_path.name, File(f), save=False)
+                    pdf_file.save()
+                    set_pages(pdf_file, extracted.pages, extracted.ocr_pages)
+                    pdf_file.keywords = keywords
+                    pdf_file.save(update_fields=['page_count', 'char_count', 'keywords'])
+
+                # Semantic chunks are an optional extra; never fail the restore over them
+                try:
+                    index_pdf_chunks(pdf_file, extracted.pages)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"✗ Chunk embedding failed for {pdf_path.name}: {str(e)}"))
 
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -0,0 +1,126 @@
+# matcher.py
+"""
+Multi-pattern keyword matching for the query-time page scan.
+
+All patterns of a query (its index terms, see core/passages.py) are
+compiled once into an Aho–Corasick automaton, and each page is scanned in a
+single pass, instead of one `term in text` scan per term. Uses the C
+implementation from pyahocorasick when it is installed and a pure-Python
+automaton otherwise. Matching is by substring, like `term in text`.
+"""
+from collections import deque
+
+try:
+    import ahocorasick
+except ImportError:  # optional speed-up
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """
+    Aho–Corasick automaton over {keyword: [patterns]}.
+    finditer(text) yields every match, scan(text) returns
+    {keyword: [count, first_offset]} for keywords found.
+    """
+
+    def __init__(self, patterns: dict):
+        self.keywords = []
+        self.pattern_list = []   # (keyword index, pattern)
+        for keyword, keyword_patterns in patterns.items():
+            index = len(self.keywords)
+            self.keywords.append(keyword)
+            for pattern in dict.fromkeys(keyword_patterns):
+                if pattern:
+                    self.pattern_list.append((index, pattern))
+
+        if ahocorasick is not None:
+            self._automaton = self._build_native()
+        else:
+            self._goto, self._fail, self._out = self._build_python()
+
+    # ---------------- Building ----------------
+    def _build_native(self):
+        if not self.pattern_list:
+            return None
+        automaton = ahocorasick.Automaton()
+        for index, pattern in self.pattern_list:
+            # one value per pattern string; several keywords may share it
+            existing = automaton.get(pattern, None)
+            owners = (existing[1] if existing else ()) + (index,)
+            automaton.add_word(pattern, (len(pattern), owners))
+        automaton.make_automaton()
+        return automaton
+
+    def _build_python(self):
+        goto, fail, out = [{}], [0], [[]]
+        for index, pattern in self.pattern_list:
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                    goto[node][ch] = nxt
+                node = nxt
+            out[node].append((index, len(pattern)))
+
+        # Breadth-first failure links; each node also emits its suffix matches
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[nxt] = goto[state].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        return goto, fail, out
+
+    # ---------------- Scanning ----------------
+    def finditer(self, text: str):
+        """
+        One pass over text, yielding (start, end, keyword) for every pattern
+        occurrence (end exclusive), in order of end offset.
+        """
+        if not text:
+            return
+        if ahocorasick is not None:
+            if self._automaton is None:
+                return
+            for last, (length, owners) in self._automaton.iter(text):
+                for index in owners:
+                    yield last - length + 1, last + 1, self.keywords[index]
+            return
+
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for position, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index, length in out[node]:
+                yield position - length + 1, position + 1, self.keywords[index]
+
+    def search(self, text: str) -> bool:
+        """
+        Whether any pattern occurs in text; stops at the first match.
+        """
+        return next(self.finditer(text), None) is not None
+
+    def scan(self, text: str) -> dict:
+        """
+        One pass over text. Returns {keyword: [count, first_offset]}.
+        """
+        hits = {}
+        for start, _, keyword in self.finditer(text):
+            hit = hits.get(keyword)
+            if hit is None:
+                hits[keyword] = [1, start]
+            else:
+                hit[0] += 1
+                if start < hit[1]:
+                    hit[1] = start
+        return hits
@@ -0,0 +1,187 @@
+# media.py
+"""
+Media serving for uploaded PDFs.
+
+Replaces django.conf.urls.static.static(), which re-sends the whole file on
+every request. serve_media answers byte ranges (206), so browser PDF viewers
+render the first pages while the rest streams; revalidates with a strong
+ETag (the sha256 content hash for PDFs) and Last-Modified, answering
+304 Not Modified; and marks content-addressed URLs (?v=<hash prefix>, see
+media_url) immutable so they are not requested again at all. media_url
+points at the web-optimized copy of a PDF when there is one.
+
+With MEDIA_ACCEL_REDIRECT set (e.g. "/protected-media/"), the file body is
+left to nginx through X-Accel-Redirect after the conditional checks.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+from .models import PDFFile
+
+MEDIA_ACCEL_REDIRECT = getattr(settings, "MEDIA_ACCEL_REDIRECT", "")  # internal nginx location prefix
+MEDIA_VERSION_CHARS = 16  # content hash prefix used as ?v= in media URLs
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"  # may be stored, but always revalidated
+RANGE_CHUNK_BYTES = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# ---------------- URLs ----------------
+def media_url(pdf) -> str:
+    """
+    URL of a PDF's web-optimized copy (core/optimize.py), else of its
+    original, versioned by the content hash so it can be cached forever.
+    """
+    if pdf.optimized_file and pdf.optimized_hash:
+        file, content_hash = pdf.optimized_file, pdf.optimized_hash
+    elif pdf.file:
+        file, content_hash = pdf.file, pdf.content_hash
+    else:
+        return None
+    if not content_hash:
+        return file.url
+    return f"{file.url}?v={content_hash[:MEDIA_VERSION_CHARS]}"
+
+
+# ---------------- Validators ----------------
+def file_etag(name: str, stat) -> str:
+    """
+    Strong ETag: the content hash of a PDF (or of its optimized copy) when
+    known, else size and mtime.
+    """
+    pdf = (
+        PDFFile.objects.filter(Q(file=name) | Q(optimized_file=name))
+        .values("file", "content_hash", "optimized_hash")
+        .first()
+    )
+    content_hash = None
+    if pdf is not None:
+        content_hash = pdf["content_hash"] if pdf["file"] == name else pdf["optimized_hash"]
+    return quote_etag(content_hash or f"{stat.st_size:x}-{stat.st_mtime_ns:x}")
+
+
+def parse_range(header: str, size: int):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to serve the
+    whole file (no, malformed or multi-part Range), or False when the range
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def if_range_passes(request, etag: str, last_modified: int) -> bool:
+    """
+    Only honour Range when If-Range (if any) still names this representation.
+    """
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag  # strong comparison; weak tags never match
+    date = parse_http_date_safe(if_range)
+    return date is not None and date >= last_modified
+
+
+def read_range(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(RANGE_CHUNK_BYTES, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+# ---------------- View ----------------
+def serve_media(request, path: str):
+    """
+    Serve a file under MEDIA_ROOT with Range, ETag / Last-Modified and
+    Cache-Control support.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid media path")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    name = path.replace(os.sep, "/")
+    stat = os.stat(full_path)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = file_etag(name, stat)
+
+    version = request.GET.get("v")
+    # only the exact prefix media_url() issues; "?v=a" would pin any hash starting with "a"
+    immutable = bool(version) and len(version) == MEDIA_VERSION_CHARS and etag.strip('"').startswith(version)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    # 304 Not Modified / 412 Precondition Failed
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        for header, value in headers.items():
+            if header not in conditional:
+                conditional[header] = value
+        return conditional
+
+    byte_range = None
+    if "HTTP_RANGE" in request.META and if_range_passes(request, etag, last_modified):
+        byte_range = parse_range(request.META["HTTP_RANGE"], size)
+    if byte_range is False:
+        response = HttpResponse(status=416, headers=headers)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    filename = os.path.basename(full_path)
+
+    if MEDIA_ACCEL_REDIRECT:
+        # nginx serves the body (and its own Range handling) from the internal location
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + quote(name)
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(full_path, "rb"), content_type=content_type, filename=filename, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    body = read_range(full_path, start, length) if request.method == "GET" else iter(())
+    response = StreamingHttpResponse(body, status=206, content_type=content_type, headers=headers)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(length)
+    response["Content-Disposition"] = content_disposition_header(False, filename)
+    return response
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+def mark_existing_done(apps, schema_editor):
+    """
+    PDFs restored before the ingestion pipeline existed already carry their
+    text, so they should not show up as pending.
+    """
+    PDFFile = apps.get_model('core', 'PDFFile')
+    PDFFile.objects.exclude(text_content='').update(status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_remove_folder_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdffile',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_done, migrations.RunPython.noop),
+    ]
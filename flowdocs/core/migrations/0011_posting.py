@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_pdffile_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdffile',
+            name='token_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Posting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('tf', models.PositiveIntegerField(default=1)),
+                ('in_keywords', models.BooleanField(default=False)),
+                ('pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='core.pdffile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='posting',
+            constraint=models.UniqueConstraint(fields=('term', 'pdf'), name='unique_posting_term_pdf'),
+        ),
+    ]
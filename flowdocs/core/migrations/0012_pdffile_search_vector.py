@@ -0,0 +1,44 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import TextField
+from django.db.models.functions import Cast, Substr
+
+
+def populate_search_vector(apps, schema_editor):
+    """
+    Fill the tsvector for existing PDFs. Only meaningful on PostgreSQL.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    PDFFile = apps.get_model('core', 'PDFFile')
+    PDFFile.objects.update(
+        search_vector=(
+            SearchVector('title', weight='A', config='simple')
+            + SearchVector(Cast('keywords', TextField()), weight='B', config='simple')
+            + SearchVector(Substr('text_content', 1, 300000), weight='C', config='simple')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_posting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdffile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='pdffile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='pdffile_search_vector_gin'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_pdffile_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('version', models.PositiveSmallIntegerField(default=1)),
+                ('pages', models.JSONField(default=list)),
+                ('used_ocr', models.BooleanField(default=False)),
+                ('language', models.CharField(blank=True, default='', max_length=10)),
+                ('keywords', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pdffile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:43
+
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import TextField
+from django.db.models.functions import Cast, Substr
+
+from core.migrations._search_text_0014 import build_postings, search_form
+
+
+def normalize_existing_pdfs(apps, schema_editor):
+    """
+    Fill search_text and rebuild postings (index terms are now transliterated
+    and folded), then refresh tsvectors on PostgreSQL.
+    """
+    PDFFile = apps.get_model('core', 'PDFFile')
+    Posting = apps.get_model('core', 'Posting')
+
+    for pdf in PDFFile.objects.only('id', 'text_content', 'keywords').iterator(chunk_size=100):
+        term_freqs, keyword_terms, token_count = build_postings(pdf.text_content, pdf.keywords)
+        Posting.objects.filter(pdf_id=pdf.pk).delete()
+        Posting.objects.bulk_create(
+            [
+                Posting(term=term, pdf_id=pdf.pk, tf=tf, in_keywords=term in keyword_terms)
+                for term, tf in term_freqs.items()
+            ],
+            batch_size=2000,
+        )
+        PDFFile.objects.filter(pk=pdf.pk).update(
+            search_text=search_form(pdf.text_content), token_count=token_count
+        )
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    PDFFile.objects.update(
+        search_vector=(
+            SearchVector('title', weight='A', config='simple')
+            + SearchVector(Cast('keywords', TextField()), weight='B', config='simple')
+            + SearchVector(Substr('search_text', 1, 300000), weight='C', config='simple')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_extraction_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdffile',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(normalize_existing_pdfs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.migrations._search_text_0014 import search_form
+
+
+def split_text_into_pages(apps, schema_editor):
+    """
+    Move PDFFile.text_content into PDFPage rows. The page texts come from the
+    extraction cache when its entry still matches the stored text; otherwise
+    the whole text becomes page 1.
+    """
+    PDFFile = apps.get_model('core', 'PDFFile')
+    PDFPage = apps.get_model('core', 'PDFPage')
+    ExtractionCache = apps.get_model('core', 'ExtractionCache')
+
+    for pdf in PDFFile.objects.only('id', 'text_content', 'content_hash').iterator(chunk_size=100):
+        text = pdf.text_content or ''
+        pages = [text] if text else []
+        entry = ExtractionCache.objects.filter(content_hash=pdf.content_hash).first() if pdf.content_hash else None
+        if entry is not None and '\n'.join(page for page in entry.pages if page).strip() == text.strip():
+            pages = entry.pages
+
+        rows, offset = [], 0
+        for number, page_text in enumerate(pages, start=1):
+            page_text = page_text or ''
+            rows.append(PDFPage(
+                pdf_id=pdf.pk, number=number, text=page_text, search_text=search_form(page_text),
+                start=offset, end=offset + len(page_text),
+            ))
+            offset += len(page_text) + 1
+        PDFPage.objects.bulk_create(rows, batch_size=500)
+        PDFFile.objects.filter(pk=pdf.pk).update(
+            page_count=len(pages), char_count=sum(len(page or '') for page in pages)
+        )
+
+
+def join_pages(apps, schema_editor):
+    PDFFile = apps.get_model('core', 'PDFFile')
+    PDFPage = apps.get_model('core', 'PDFPage')
+
+    for pdf in PDFFile.objects.only('id').iterator(chunk_size=100):
+        pages = PDFPage.objects.filter(pdf_id=pdf.pk).order_by('number').values_list('text', flat=True)
+        text = '\n'.join(page for page in pages if page).strip()
+        PDFFile.objects.filter(pk=pdf.pk).update(text_content=text, search_text=search_form(text))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_pdffile_search_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractioncache',
+            name='ocr_pages',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='pdffile',
+            name='char_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pdffile',
+            name='page_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PDFPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True, default='')),
+                ('search_text', models.TextField(blank=True, default='')),
+                ('used_ocr', models.BooleanField(default=False)),
+                ('start', models.PositiveIntegerField(default=0)),
+                ('end', models.PositiveIntegerField(default=0)),
+                ('pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='core.pdffile')),
+            ],
+            options={
+                'ordering': ['number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pdfpage',
+            constraint=models.UniqueConstraint(fields=('pdf', 'number'), name='unique_pdfpage_pdf_number'),
+        ),
+        migrations.RunPython(split_text_into_pages, join_pages),
+        migrations.RemoveField(
+            model_name='pdffile',
+            name='search_text',
+        ),
+        migrations.RemoveField(
+            model_name='pdffile',
+            name='text_content',
+        ),
+    ]
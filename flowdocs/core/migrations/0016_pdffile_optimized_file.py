@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_pdfpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdffile',
+            name='optimized_file',
+            field=models.FileField(blank=True, default='', upload_to='pdfs/optimized/'),
+        ),
+        migrations.AddField(
+            model_name='pdffile',
+            name='optimized_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='pdffile',
+            name='optimized_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pdffile',
+            name='original_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 # ---------------- Custom User ----------------
 class CustomUser(AbstractUser):
@@ -25,8 +27,25 @@ class Folder(models.Model):
 
 # ---------------- PDF File ----------------
 class PDFFile(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    # Large columns; defer them wherever only metadata (title, file, folder,
+    # status) is read, e.g. listings and search results. The document text
+    # itself lives in PDFPage rows.
+    TEXT_FIELDS = ("keywords", "search_vector")
+
     title = models.CharField(max_length=200)
     file = models.FileField(upload_to="pdfs/")
+    # Web-optimized copy served instead of the original (see core/optimize.py)
+    optimized_file = models.FileField(upload_to="pdfs/optimized/", blank=True, default="")
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="uploaded_pdfs"
     )
@@ -37,7 +56,47 @@ class PDFFile(models.Model):
     
     # --- New fields for search optimization ---
     keywords = models.JSONField(default=list, blank=True)  # store keywords safely
-    text_content = models.TextField(blank=True, default="")  # store extracted PDF text
+
+    # --- Extracted text aggregates (the text itself is in PDFPage, see core/pages.py) ---
+    page_count = models.PositiveIntegerField(default=0)
+    char_count = models.PositiveIntegerField(default=0)  # extracted characters over all pages; 0 = no text yet
+
+    # --- Ingestion pipeline state (see core/ingest.py) ---
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)  # sha256 of the file bytes
+    optimized_hash = models.CharField(max_length=64, blank=True, default="")  # sha256 of optimized_file
+    original_size = models.PositiveBigIntegerField(default=0)  # bytes, recorded when optimized
+    optimized_size = models.PositiveBigIntegerField(default=0)
+
+    # --- Inverted index aggregates (see core/search_index.py) ---
+    token_count = models.PositiveIntegerField(default=0)  # indexed terms in this document
+
+    # --- PostgreSQL full-text search (see core/search_backends.py) ---
+    # Weighted tsvector over title (A), keywords (B) and the pages' search_text (C).
+    # Only populated on PostgreSQL; stays NULL on SQLite.
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="pdffile_search_vector_gin"),
+        ]
+
+    @property
+    def text(self) -> str:
+        """
+        Document text: the pages joined with newlines (PDFPage offsets index
+        into it). One query, none when pages are prefetched.
+        """
+        return "\n".join(page.text for page in self.pages.all())
+
+    @property
+    def web_url(self) -> str:
+        """
+        URL to open the PDF with (see core/media.py: media_url).
+        """
+        from .media import media_url
+
+        return media_url(self)
 
     def delete(self, *args, **kwargs):
         """
@@ -45,7 +104,90 @@ class PDFFile(models.Model):
         """
         if self.file:
             self.file.delete(save=False)
+        if self.optimized_file:
+            self.optimized_file.delete(save=False)
         super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} (Folder: {self.folder.name if self.folder else 'No Folder'})"
+
+
+# ---------------- PDF Page ----------------
+class PDFPage(models.Model):
+    """
+    Extracted text of one PDF page, written by core/pages.py. start/end are
+    the page's character offsets in PDFFile.text.
+    """
+    pdf = models.ForeignKey(PDFFile, on_delete=models.CASCADE, related_name="pages")
+    number = models.PositiveIntegerField()  # 1-based page number in the file
+    text = models.TextField(blank=True, default="")
+    # Transliterated (Devanagari → Latin) and case/diacritic-folded text;
+    # query-time matching and the PostgreSQL tsvector read this.
+    search_text = models.TextField(blank=True, default="")
+    used_ocr = models.BooleanField(default=False)  # text came from OCR, not the text layer
+    start = models.PositiveIntegerField(default=0)
+    end = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["number"]
+        constraints = [
+            models.UniqueConstraint(fields=["pdf", "number"], name="unique_pdfpage_pdf_number"),
+        ]
+
+    def __str__(self):
+        return f"{self.pdf_id} p.{self.number} ({len(self.text)} chars)"
+
+
+# ---------------- Inverted Index Posting ----------------
+class Posting(models.Model):
+    """
+    One normalized term occurring in one PDF, with its term frequency.
+    Maintained by core/search_index.py whenever a PDFFile's text or keywords change.
+    """
+    term = models.CharField(max_length=100)
+    pdf = models.ForeignKey(PDFFile, on_delete=models.CASCADE, related_name="postings")
+    tf = models.PositiveIntegerField(default=1)
+    in_keywords = models.BooleanField(default=False)  # term also appears in PDFFile.keywords
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["term", "pdf"], name="unique_posting_term_pdf"),
+        ]
+
+    def __str__(self):
+        return f"{self.term} → {self.pdf_id} (tf={self.tf})"
+
+
+# ---------------- Extraction Cache ----------------
+class ExtractionCache(models.Model):
+    """
+    Extraction results keyed by the sha256 of the PDF bytes, so the same file
+    (re-uploaded, restored or copied into another folder) is only read,
+    OCR'd and run through YAKE once. See core/extraction_cache.py.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    version = models.PositiveSmallIntegerField(default=1)  # bumped when extraction changes
+    pages = models.JSONField(default=list)  # text per page, in page order
+    used_ocr = models.BooleanField(default=False)  # at least one page came from OCR
+    ocr_pages = models.JSONField(default=list, blank=True)  # 1-based numbers of the OCR'd pages
+    language = models.CharField(max_length=10, blank=True, default="")
+    keywords = models.JSONField(null=True, blank=True)  # None = not extracted yet
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Pages of a fresh extraction whose OCR failed (not a column: such
+    # extractions are never stored, so the pages are OCR'd again next time)
+    ocr_failed_pages = ()
+
+    @property
+    def text(self) -> str:
+        return "\n".join(page for page in self.pages if page).strip()
+
+    @property
+    def complete(self) -> bool:
+        """
+        Worth caching: some text was found, and OCR did not fail on any page.
+        """
+        return bool(self.text) and not self.ocr_failed_pages
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({len(self.pages)} pages)"
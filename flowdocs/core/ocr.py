@@ -0,0 +1,120 @@
+# ocr.py
+"""
+OCR subsystem for pages without a text layer.
+
+Only those pages are rendered to images (page.get_pixmap) and queued to a
+bounded pool of OCR worker processes, so scanned pages of a mixed PDF are
+OCR'd in parallel across cores instead of blocking the calling thread.
+Results are returned per page number, so callers can put them back in order.
+
+The pool is per process: every process that ingests PDFs starts its own
+OCR_WORKERS EasyOCR processes (each holding the models in memory). Run
+ingestion in the single `ingest_pending_pdfs --watch` process
+(INGEST_BACKEND = "worker", as start.sh does) to keep OCR_WORKERS the total;
+with the default in-process ingestion threads it is multiplied by the
+number of web workers.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+
+from .ocr_worker import init_worker, ocr_image
+from .registry import OCR_LANGUAGES, OCR_USE_GPU, get_ocr_reader
+
+OCR_WORKERS = getattr(settings, "OCR_WORKERS", 2)  # 0 = OCR inline in the calling process
+OCR_MAX_PENDING = getattr(settings, "OCR_MAX_PENDING", OCR_WORKERS * 2 or 1)  # rendered pages waiting for a worker
+OCR_RENDER_DPI = 200
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """
+    Process-wide OCR pool, created on first use. Uses "spawn" so workers do
+    not inherit the parent's threads, DB connections or torch state.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                print(f"[🖼] Starting OCR pool with {OCR_WORKERS} workers")
+                _pool = ProcessPoolExecutor(
+                    max_workers=OCR_WORKERS,
+                    mp_context=get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(OCR_LANGUAGES, OCR_USE_GPU),
+                )
+    return _pool
+
+
+def reset_ocr_pool() -> None:
+    """
+    Drop a broken pool (e.g. a worker was OOM-killed) so the next call starts fresh.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def render_page(page, dpi: int = OCR_RENDER_DPI) -> bytes:
+    return page.get_pixmap(dpi=dpi).tobytes("png")
+
+
+def ocr_pages(doc, page_numbers: list) -> dict:
+    """
+    OCR the given 1-based page numbers of an open PyMuPDF document.
+    Returns {page_number: text}: "" where OCR found no text, None where
+    rendering or OCR failed.
+    """
+    if not page_numbers:
+        return {}
+
+    if OCR_WORKERS <= 0:
+        reader = get_ocr_reader()
+        results = {}
+        for number in page_numbers:
+            try:
+                results[number] = "\n".join(reader.readtext(render_page(doc[number - 1]), detail=0))
+            except Exception as e:
+                print(f"[❌] EasyOCR failed on page {number}: {e}")
+                results[number] = None
+        return results
+
+    pool = get_ocr_pool()
+    slots = threading.BoundedSemaphore(OCR_MAX_PENDING)
+    futures, results = {}, {}
+    try:
+        for number in page_numbers:
+            # Bound the number of rendered images held in memory / in the queue
+            slots.acquire()
+            try:
+                image = render_page(doc[number - 1])
+            except Exception as e:
+                slots.release()
+                print(f"[❌] Rendering page {number} for OCR failed: {e}")
+                results[number] = None
+                continue
+            future = pool.submit(ocr_image, image)
+            future.add_done_callback(lambda _: slots.release())
+            futures[number] = future
+    except BrokenProcessPool:
+        reset_ocr_pool()
+        raise
+
+    for number, future in futures.items():
+        try:
+            results[number] = future.result()
+        except BrokenProcessPool:
+            reset_ocr_pool()
+            raise
+        except Exception as e:
+            print(f"[❌] EasyOCR failed on page {number}: {e}")
+            results[number] = None
+    print(f"[🖼] OCR finished for {len(page_numbers)} pages")
+    return results
@@ -0,0 +1,22 @@
+# ocr_worker.py
+"""
+Code that runs inside the OCR worker processes (see core/ocr.py).
+
+Kept free of Django imports so spawned workers start quickly; each worker
+loads its own EasyOCR reader once in the pool initializer.
+"""
+_reader = None
+
+
+def init_worker(languages: list, use_gpu: bool) -> None:
+    global _reader
+    import easyocr
+    _reader = easyocr.Reader(languages, gpu=use_gpu)
+
+
+def ocr_image(png_bytes: bytes) -> str:
+    """
+    Run EasyOCR on one rendered page image.
+    """
+    result = _reader.readtext(png_bytes, detail=0)
+    return "\n".join(result)
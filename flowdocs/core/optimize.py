@@ -0,0 +1,107 @@
+# optimize.py
+"""
+Web-optimized copies of uploaded PDFs.
+
+After ingestion each PDF is rewritten with PyMuPDF: oversized images are
+downsampled and recompressed (Document.rewrite_images, when the installed
+PyMuPDF has it), unused objects are dropped and streams deflated
+(save(garbage=4, deflate=True)), and the file is linearized for fast first
+page display where MuPDF still supports it (it was removed in 1.25). The
+copy is stored in PDFFile.optimized_file next to the untouched original,
+which text extraction keeps reading; media_url() serves the copy by default.
+"""
+import os
+import tempfile
+
+import fitz
+from django.conf import settings
+from django.core.files import File
+
+from .extraction_cache import file_sha256
+from .models import PDFFile
+
+PDF_OPTIMIZE_ENABLED = getattr(settings, "PDF_OPTIMIZE_ENABLED", True)
+PDF_OPTIMIZE_IMAGE_DPI = getattr(settings, "PDF_OPTIMIZE_IMAGE_DPI", 150)  # target resolution for images
+PDF_OPTIMIZE_IMAGE_QUALITY = getattr(settings, "PDF_OPTIMIZE_IMAGE_QUALITY", 75)  # JPEG quality
+IMAGE_DPI_THRESHOLD_FACTOR = 1.3  # only images above target * factor are downsampled
+LINEARIZATION_UNSUPPORTED = "Linearisation is no longer supported"  # MuPDF 1.25+ save(linear=True) error
+
+_linear_supported = True
+
+
+def save_optimized(doc, output_path: str) -> bool:
+    """
+    Garbage-collect, deflate and (when supported) linearize doc into output_path.
+    Returns whether the file was linearized. Only MuPDF's "no longer
+    supported" error turns linearization off for the process; any other
+    save error (I/O, a broken file) is raised for this file alone.
+    """
+    global _linear_supported
+    if _linear_supported:
+        try:
+            doc.save(output_path, garbage=4, deflate=True, linear=True)
+            return True
+        except Exception as e:
+            if LINEARIZATION_UNSUPPORTED not in str(e):
+                raise
+            print(f"[⚠️] PDF linearization unavailable, saving without it: {e}")
+            _linear_supported = False
+    doc.save(output_path, garbage=4, deflate=True)
+    return False
+
+
+def optimize_pdf(input_path: str, output_path: str) -> bool:
+    """
+    Write the web-optimized version of input_path to output_path.
+    Returns whether it was linearized.
+    """
+    doc = fitz.open(input_path)
+    try:
+        if hasattr(doc, "rewrite_images"):
+            doc.rewrite_images(
+                dpi_threshold=int(PDF_OPTIMIZE_IMAGE_DPI * IMAGE_DPI_THRESHOLD_FACTOR),
+                dpi_target=PDF_OPTIMIZE_IMAGE_DPI,
+                quality=PDF_OPTIMIZE_IMAGE_QUALITY,
+            )
+        return save_optimized(doc, output_path)
+    finally:
+        doc.close()
+
+
+def optimize_pdf_file(pdf: PDFFile) -> bool:
+    """
+    Store a web-optimized copy of pdf.file and record the sizes. The copy is
+    kept when it is no larger than the original (a linearized file of the
+    same size still shows its first page sooner). Returns whether one was stored.
+    """
+    if not pdf.file:
+        return False
+
+    original_path = pdf.file.path
+    original_size = os.path.getsize(original_path)
+    fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        linearized = optimize_pdf(original_path, temp_path)
+        optimized_size = os.path.getsize(temp_path)
+        if optimized_size > original_size or (optimized_size == original_size and not linearized):
+            print(f"[📦] No smaller copy for PDF {pdf.pk} ({original_size} bytes), serving the original")
+            return False
+
+        if pdf.optimized_file:
+            pdf.optimized_file.delete(save=False)
+        with open(temp_path, "rb") as f:
+            pdf.optimized_file.save(os.path.basename(pdf.file.name), File(f), save=False)
+        pdf.original_size = original_size
+        pdf.optimized_size = optimized_size
+        pdf.optimized_hash = file_sha256(temp_path)
+    finally:
+        os.remove(temp_path)
+
+    pdf.save(update_fields=["optimized_file", "original_size", "optimized_size", "optimized_hash"])
+    saved = original_size - optimized_size
+    print(
+        f"[📦] Optimized PDF {pdf.pk}: {original_size} → {optimized_size} bytes "
+        f"({saved / max(original_size, 1):.0%} smaller{', linearized' if linearized else ''})"
+    )
+    return True
@@ -0,0 +1,87 @@
+# pages.py
+"""
+Per-page document text (PDFPage rows).
+
+Extracted text is stored one row per page instead of in a column on
+PDFFile, so metadata queries (listings, search results, deletes) never carry
+the document body, and passages and citations can work page by page. Each
+page keeps its transliterated / folded search form and its character
+offsets in PDFFile.text (the pages joined with newlines); PDFFile keeps the
+page_count and char_count aggregates.
+"""
+from django.db import transaction
+
+from .models import PDFFile, PDFPage
+from .text import search_form
+
+PAGE_BATCH_SIZE = 500
+
+
+def build_pages(pdf: PDFFile, pages: list, ocr_pages=()) -> list:
+    """
+    Unsaved PDFPage rows for a PDF's page texts (in page order).
+    ocr_pages holds the 1-based numbers of pages that came from OCR.
+    """
+    ocr_pages = set(ocr_pages or ())
+    rows, offset = [], 0
+    for number, text in enumerate(pages, start=1):
+        text = text or ""
+        rows.append(PDFPage(
+            pdf_id=pdf.pk,
+            number=number,
+            text=text,
+            search_text=search_form(text),
+            used_ocr=number in ocr_pages,
+            start=offset,
+            end=offset + len(text),
+        ))
+        offset += len(text) + 1  # the newline joining pages
+    return rows
+
+
+def page_aggregates(pages: list) -> dict:
+    """
+    PDFFile.page_count / char_count for a list of page texts.
+    """
+    return {"page_count": len(pages), "char_count": sum(len(text or "") for text in pages)}
+
+
+@transaction.atomic
+def set_pages(pdf: PDFFile, pages: list, ocr_pages=()) -> None:
+    """
+    Replace a PDF's pages and set its aggregates on the instance. Callers
+    save page_count / char_count, which re-indexes the PDF (core/signals.py).
+    """
+    PDFPage.objects.filter(pdf_id=pdf.pk).delete()
+    PDFPage.objects.bulk_create(build_pages(pdf, pages, ocr_pages), batch_size=PAGE_BATCH_SIZE)
+    for field, value in page_aggregates(pages).items():
+        setattr(pdf, field, value)
+
+
+def update_search_text(pdf: PDFFile) -> None:
+    """
+    Recompute the search form of every page of a PDF, e.g. after the
+    transliteration scheme (core/text.py) changed.
+    """
+    pages = list(pdf.pages.all())
+    for page in pages:
+        page.search_text = search_form(page.text)
+    PDFPage.objects.bulk_update(pages, ["search_text"], batch_size=PAGE_BATCH_SIZE)
+
+
+def document_texts(pdf_ids, max_chars: int = None) -> dict:
+    """
+    {pdf_id: text} for several PDFs in one query; with max_chars only the
+    pages starting within that prefix are read, and the text is cut to it.
+    """
+    pages = PDFPage.objects.filter(pdf_id__in=list(pdf_ids))
+    if max_chars:
+        pages = pages.filter(start__lt=max_chars)
+
+    texts = {}
+    for pdf_id, text in pages.order_by("pdf_id", "number").values_list("pdf_id", "text"):
+        texts.setdefault(pdf_id, []).append(text)
+    return {
+        pdf_id: "\n".join(parts)[:max_chars] if max_chars else "\n".join(parts)
+        for pdf_id, parts in texts.items()
+    }
@@ -0,0 +1,271 @@
+# passages.py
+"""
+Query-focused passages for the LLM context.
+
+Instead of the first characters of every matched PDF (usually the cover page
+and table of contents), each page is scanned for the query's index terms and
+the best windows around the hits are kept, with their page number. The terms
+are compiled once per query into an Aho–Corasick automaton (core/matcher.py):
+one pass over a page's stored search form skips pages without any of them,
+and a second pass over the page's words gives the hit offsets. Passages
+from all matched documents (plus semantic chunks, when available) are then
+packed into one context under a token budget, round-robin by document rank,
+skipping passages that repeat text already selected. The same passages
+give each reference its page citations ({page, score, snippet, url}).
+"""
+import math
+from bisect import bisect_right
+
+from .matcher import KeywordMatcher
+from .models import PDFPage
+from .query_analyzer import extract_query_keywords
+from .search_index import query_terms
+from .text import TOKEN_RE, normalize_term, words
+from .tokens import count_tokens
+
+PASSAGE_CHARS = 700          # window size around the hits
+PASSAGE_LEAD_CHARS = 150     # text kept before the first hit of a window
+MAX_PASSAGES_PER_PDF = 3
+DUPLICATE_OVERLAP = 0.6      # share of a passage's words already selected
+MIN_PASSAGE_TOKENS = 30
+SNIPPET_CHARS = 240          # citation snippet shown with a reference
+SNIPPET_LEAD_CHARS = 60      # text kept before the first hit in a snippet
+MAX_CITED_PAGES = 3          # page citations per reference
+
+
+# ---------------- Page text ----------------
+def page_texts(pdfs) -> dict:
+    """
+    {pdf_id: {page_number: (text, search_text)}} from the PDFPage rows, one
+    query for all PDFs.
+    """
+    pages = {}
+    rows = PDFPage.objects.filter(pdf_id__in=[pdf.id for pdf in pdfs]).exclude(text="")
+    for pdf_id, number, text, search_text in rows.values_list("pdf_id", "number", "text", "search_text"):
+        pages.setdefault(pdf_id, {})[number] = (text, search_text)
+    return pages
+
+
+# ---------------- Passage scoring ----------------
+def term_matcher(terms: list) -> KeywordMatcher:
+    """
+    One automaton over a query's index terms.
+    """
+    return KeywordMatcher({term: [term] for term in terms})
+
+
+def aligned_search_form(text: str) -> tuple:
+    """
+    (form, form_starts, text_starts): the words of text in their index form
+    (normalize_term) joined with spaces, and where each word starts in form
+    and in text, so a hit in form maps back to an offset in text.
+    """
+    terms, form_starts, text_starts, position = [], [], [], 0
+    for match in TOKEN_RE.finditer(text):
+        term = normalize_term(match.group())
+        if not term:
+            continue
+        terms.append(term)
+        form_starts.append(position)
+        text_starts.append(match.start())
+        position += len(term) + 1
+    return " ".join(terms), form_starts, text_starts
+
+
+def term_hits(text: str, matcher: KeywordMatcher, search_text: str = None) -> list:
+    """
+    [(offset, term)] for every word of text whose index form is one of the
+    matcher's terms. Works across scripts: "pani" hits "पाणी". With the
+    page's stored search_text, a page containing none of the terms is
+    skipped after one pass, before its words are normalized.
+    """
+    if search_text and not matcher.search(search_text):
+        return []
+
+    form, form_starts, text_starts = aligned_search_form(text)
+    hits = []
+    for start, end, term in matcher.finditer(form):
+        index = bisect_right(form_starts, start) - 1
+        # whole words only, like the index
+        if form_starts[index] == start and (end == len(form) or form[end] == " "):
+            hits.append((text_starts[index], term))
+    return hits
+
+
+def snap_window(text: str, start: int, end: int, slack: int = 40) -> tuple:
+    """
+    Widen [start, end) by up to slack characters to the nearest whitespace,
+    so words are not cut.
+    """
+    start, end = max(start, 0), min(end, len(text))
+    limit = max(start - slack, 0)
+    while start > limit and not text[start - 1].isspace():
+        start -= 1
+    limit = min(end + slack, len(text))
+    while end < limit and not text[end].isspace():
+        end += 1
+    return start, end
+
+
+def make_snippet(text: str, focus: int = 0) -> str:
+    """
+    About SNIPPET_CHARS of text starting a little before offset focus,
+    on word boundaries, with ellipses where it was cut.
+    """
+    start, end = snap_window(text, focus - SNIPPET_LEAD_CHARS, focus - SNIPPET_LEAD_CHARS + SNIPPET_CHARS, slack=20)
+    snippet = " ".join(text[start:end].split())
+    return f"{'…' if start > 0 else ''}{snippet}{'…' if end < len(text) else ''}"
+
+
+def page_windows(text: str, hits: list, weights: dict) -> list:
+    """
+    Best non-overlapping windows of one page as [(score, start, end)].
+    A window scores the weights of the distinct terms it contains, plus a
+    little for repeated hits.
+    """
+    candidates = []
+    last = 0
+    for i, (offset, _) in enumerate(hits):
+        window_end = offset - PASSAGE_LEAD_CHARS + PASSAGE_CHARS
+        last = max(last, i)
+        while last < len(hits) and hits[last][0] < window_end:
+            last += 1
+        in_window = hits[i:last]
+        distinct = {term for _, term in in_window}
+        score = sum(weights[term] for term in distinct) + 0.1 * (len(in_window) - len(distinct))
+        candidates.append((score, offset - PASSAGE_LEAD_CHARS))
+
+    chosen = []
+    for score, start in sorted(candidates, key=lambda item: item[0], reverse=True):
+        if all(start + PASSAGE_CHARS <= other or start >= other + PASSAGE_CHARS for _, other in chosen):
+            chosen.append((score, start))
+    return [(score, *snap_window(text, start, start + PASSAGE_CHARS)) for score, start in chosen]
+
+
+def pdf_passages(pages: dict, matcher: KeywordMatcher, limit: int = MAX_PASSAGES_PER_PDF) -> list:
+    """
+    The best passages of one document ({page_number: (text, search_text)})
+    as dicts with page, start, end, score, text and snippet; start/end are
+    character offsets into that page's text.
+    """
+    page_hits = {
+        number: term_hits(text, matcher, search_text)
+        for number, (text, search_text) in pages.items() if text
+    }
+
+    # Terms found on most pages (running headers, the council's name) count less
+    page_freq = {}
+    for hits in page_hits.values():
+        for term in {term for _, term in hits}:
+            page_freq[term] = page_freq.get(term, 0) + 1
+    weights = {term: 1 + math.log((len(pages) + 1) / (freq + 1)) for term, freq in page_freq.items()}
+
+    passages = []
+    for number, hits in page_hits.items():
+        if not hits:
+            continue
+        text = pages[number][0]
+        for score, start, end in page_windows(text, hits, weights):
+            first_hit = next((offset for offset, _ in hits if offset >= start), start)
+            passages.append({
+                "page": number, "start": start, "end": end, "score": score,
+                "text": text[start:end].strip(), "snippet": make_snippet(text, first_hit),
+            })
+    passages.sort(key=lambda passage: passage["score"], reverse=True)
+    return passages[:limit]
+
+
+def chunk_passages(chunks: list) -> dict:
+    """
+    Group semantic chunks (vectorstore.query_chunks) by PDF as passages,
+    scored 1 - distance.
+    """
+    grouped = {}
+    for chunk in chunks:
+        text = chunk["text"].strip()
+        grouped.setdefault(chunk["pdf_id"], []).append(
+            {"page": chunk.get("page"), "score": 1 - chunk["distance"], "text": text, "snippet": make_snippet(text)}
+        )
+    return grouped
+
+
+# ---------------- Context assembly ----------------
+def format_passage(title: str, passage: dict) -> str:
+    source = f"{title}, page {passage['page']}" if passage.get("page") else title
+    return f"[{source}]\n{passage['text']}"
+
+
+def assemble_context(groups: list, budget: int) -> tuple:
+    """
+    Pack passages into a context of at most budget tokens (what
+    PROMPT_TOKEN_BUDGET leaves, see utils.build_answer_messages).
+    groups is [(title, [passage, ...])] in document rank order, each list
+    best first; passages are taken round-robin across documents, and those
+    mostly repeating words already selected (overlapping windows, duplicate
+    files, a chunk covering the same lines) are skipped.
+    Returns (context, selected) where selected is [(title, passage)].
+    """
+    selected, parts, seen, used = [], [], [], 0
+    queues = [(title, list(passages)) for title, passages in groups if passages]
+    while queues and budget - used >= MIN_PASSAGE_TOKENS:
+        for title, passages in list(queues):
+            if not passages:
+                queues.remove((title, passages))
+                continue
+            passage = passages.pop(0)
+            passage_words = set(words(passage["text"]))
+            if not passage_words:
+                continue
+            if any(len(passage_words & other) >= DUPLICATE_OVERLAP * len(passage_words) for other in seen):
+                continue
+            part = format_passage(title, passage)
+            cost = count_tokens(part) + 1  # + the blank line between passages
+            if used + cost > budget:
+                continue
+            selected.append((title, passage))
+            parts.append(part)
+            seen.append(passage_words)
+            used += cost
+
+    return "\n\n".join(parts), selected
+
+
+# ---------------- Citations ----------------
+def page_citations(passages: list, url: str = None, limit: int = MAX_CITED_PAGES) -> list:
+    """
+    [{page, score, snippet, url}] for the best pages among one document's
+    passages (keyword passages first, then semantic chunks), url deep-linking
+    to the page with #page=N.
+    """
+    citations = {}
+    for passage in passages:
+        page = passage.get("page")
+        if page is None or page in citations:
+            continue
+        citations[page] = {
+            "page": page,
+            "score": round(passage["score"], 3),
+            "snippet": passage.get("snippet") or make_snippet(passage["text"]),
+            "url": f"{url}#page={page}" if url else None,
+        }
+        if len(citations) == limit:
+            break
+    return list(citations.values())
+
+
+def answer_passages(query: str, pdfs: list, chunks: list = ()) -> list:
+    """
+    Candidate passages for the ranked PDFs (best first) as [(title, [passage])]:
+    keyword passages of each document, followed by its semantic chunks.
+    """
+    terms = query_terms(extract_query_keywords(query))
+    matcher = term_matcher(terms)
+    pages = page_texts(pdfs)
+    by_pdf = chunk_passages(chunks)
+
+    groups = []
+    for pdf in pdfs:
+        passages = pdf_passages(pages.get(pdf.id, {}), matcher) if terms else []
+        groups.append((pdf.title, passages + by_pdf.get(pdf.id, [])))
+    return groups
+
@@ -0,0 +1,118 @@
+# query_analyzer.py
+"""
+Lightweight analysis of user questions (at most MAX_QUERY_WORDS words).
+
+YAKE and langdetect are built for documents; for a short question they are
+slow and unstable. Here a question is split with the same tokenizer as the
+index (core/text.py), stopwords are dropped (English always, Marathi for
+Devanagari or romanized Marathi questions), and the remaining words plus
+their adjacent pairs become the query keywords. The language is decided
+from the script. Results are memoized per question
+string, so repeated FAQ questions cost a dictionary lookup.
+"""
+import re
+from functools import lru_cache
+
+from .text import is_indexable, normalize_term, words
+
+QUERY_NGRAM_SIZE = 2            # same as YAKE_NGRAM_SIZE for documents
+QUERY_CACHE_SIZE = 4096
+DEVANAGARI_RE = re.compile(r"[\u0900-\u097F]")
+
+ENGLISH_STOPWORDS = """
+a about above after again all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has
+have having he her here hers him his how i if in into is it its itself just let me more most my
+no nor not of off on once only or other our ours out over own please same she should so some
+such than that the their theirs them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your
+yours tell know give get want need find show
+""".split()
+
+MARATHI_STOPWORDS = """
+आणि व किंवा पण की का काय कसे कशी कसा कोण कोणते कोणता कोणती कुठे केव्हा कधी किती कृपया
+आहे आहेत होते होता होती असे असा अशी आहोत आहात नाही नाहीत हा ही हे तो ती ते त्या त्याचा
+त्याची त्याचे त्यांचा त्यांची त्यांचे या याचा याची याचे मी आम्ही तुम्ही तू आपण माझा माझी माझे
+मला तुम्हाला आम्हाला साठी मध्ये मधे वर खाली पर्यंत पासून बद्दल सोबत तर जर म्हणजे मग
+करा करावे करावी करणे करता सांगा द्या हवे हवी पाहिजे येथे तेथे जे जी जो एक
+""".split()
+
+# Compared in normalized (transliterated / folded) form, so romanized Marathi
+# stopwords ("ahe", "kay") match Latin-script questions too. The Marathi list
+# only applies to questions that are Marathi (stopwords_for), and romanized
+# forms that are also English words or acronyms ("pan" for पण, "jar" for जर)
+# are never dropped from Latin-script text.
+ENGLISH_STOPWORD_TERMS = frozenset(normalize_term(word) for word in ENGLISH_STOPWORDS)
+MARATHI_STOPWORD_TERMS = frozenset(normalize_term(word) for word in MARATHI_STOPWORDS)
+ROMANIZED_ENGLISH_WORDS = frozenset({"pan", "jar", "tar", "mag", "var"})
+ROMANIZED_STOPWORD_TERMS = (
+    MARATHI_STOPWORD_TERMS - ENGLISH_STOPWORD_TERMS - ROMANIZED_ENGLISH_WORDS
+)
+STOPWORDS = ENGLISH_STOPWORD_TERMS | MARATHI_STOPWORD_TERMS
+
+
+def is_stopword(word: str, stopwords: frozenset = STOPWORDS) -> bool:
+    return normalize_term(word) in stopwords
+
+
+def stopwords_for(query: str, query_words: list) -> frozenset:
+    """
+    All stopwords for Devanagari questions; for Latin-script questions the
+    English ones, plus the romanized Marathi ones when they outnumber the
+    English ones ("pan card kasa milel").
+    """
+    if query_language(query) == "mr":
+        return STOPWORDS
+    terms = [normalize_term(word) for word in query_words]
+    marathi = sum(term in ROMANIZED_STOPWORD_TERMS for term in terms)
+    english = sum(term in ENGLISH_STOPWORD_TERMS for term in terms)
+    if marathi > english:
+        return ENGLISH_STOPWORD_TERMS | ROMANIZED_STOPWORD_TERMS
+    return ENGLISH_STOPWORD_TERMS
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def query_language(query: str) -> str:
+    """
+    'mr' for questions written in Devanagari, 'en' otherwise.
+    """
+    return "mr" if DEVANAGARI_RE.search(query) else "en"
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _analyze(query: str) -> tuple:
+    query_words = [word for word in words(query) if is_indexable(word)]
+    stopwords = stopwords_for(query, query_words)
+
+    # Runs of content words between stopwords; n-grams never bridge a stopword
+    runs, run = [], []
+    for word in query_words:
+        if is_stopword(word, stopwords):
+            if run:
+                runs.append(run)
+            run = []
+        else:
+            run.append(word)
+    if run:
+        runs.append(run)
+
+    if not runs and query_words:
+        # nothing but stopwords ("what is this?"): keep the words themselves
+        runs = [query_words]
+
+    keywords = []
+    for run in runs:
+        for size in range(1, QUERY_NGRAM_SIZE + 1):
+            for start in range(len(run) - size + 1):
+                keywords.append(" ".join(run[start:start + size]))
+    return tuple(dict.fromkeys(keywords))
+
+
+def extract_query_keywords(query: str) -> list:
+    """
+    Case-folded keywords of a question in their original script: content
+    words and their adjacent pairs, in question order. Drop-in replacement
+    for extract_keywords() on short text; query_terms() turns them into
+    index terms.
+    """
+    return list(_analyze(query.strip()))
@@ -0,0 +1,141 @@
+# ranking.py
+"""
+Hybrid ranking across every folder a session may search.
+
+A lexical ranking (BM25 over the Posting index, or ts_rank on PostgreSQL) and
+a semantic ranking (nearest Chroma chunks) are computed once per query and
+merged with reciprocal rank fusion into a single global top-k.
+"""
+import math
+
+from django.conf import settings
+from django.db.models import Avg, Count
+
+from .models import PDFFile, Posting
+from .query_analyzer import extract_query_keywords
+from .search_backends import get_search_engine, postgres_search
+from .search_index import query_term_spellings, query_terms
+from .vectorstore import query_chunks
+
+RANKING_TOP_K = getattr(settings, "RANKING_TOP_K", 5)
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60                 # standard reciprocal rank fusion constant
+MIN_TERM_COVERAGE = 0.3    # share of query terms a lexical hit must contain
+SEMANTIC_MAX_DISTANCE = getattr(settings, "SEMANTIC_MAX_DISTANCE", 1.0)  # squared L2 on normalized MiniLM vectors
+CANDIDATE_MULTIPLIER = 4   # each ranker contributes top_k * 4 candidates
+
+
+# ---------------- Lexical ----------------
+def bm25_ranking(terms: list, folder_ids: list, limit: int) -> list:
+    """
+    Score documents in folder_ids with BM25 using only the postings of terms.
+    Returns [(pdf_id, score)] best first.
+    """
+    if not terms or not folder_ids:
+        return []
+
+    docs = PDFFile.objects.filter(folder_id__in=folder_ids, token_count__gt=0)
+    stats = docs.aggregate(n=Count("id"), avgdl=Avg("token_count"))
+    n_docs, avgdl = stats["n"], stats["avgdl"] or 1
+    if not n_docs:
+        return []
+
+    postings = Posting.objects.filter(term__in=terms, pdf__folder_id__in=folder_ids)
+    doc_freq = dict(postings.values("term").annotate(df=Count("id")).values_list("term", "df"))
+
+    scores, matched_terms = {}, {}
+    for pdf_id, term, tf, doc_len in postings.values_list("pdf_id", "term", "tf", "pdf__token_count"):
+        df = doc_freq.get(term, 0)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avgdl)
+        scores[pdf_id] = scores.get(pdf_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        matched_terms[pdf_id] = matched_terms.get(pdf_id, 0) + 1
+
+    min_terms = MIN_TERM_COVERAGE * len(terms)
+    ranked = [(pdf_id, score) for pdf_id, score in scores.items() if matched_terms[pdf_id] >= min_terms]
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked[:limit]
+
+
+def lexical_ranking(keywords: list, folder_ids: list, limit: int) -> list:
+    """
+    BM25 on the in-Python engine, ts_rank inside PostgreSQL otherwise; both
+    drop hits with under MIN_TERM_COVERAGE of the query terms.
+    """
+    if get_search_engine() == "postgres":
+        term_spellings = query_term_spellings(keywords)
+        ranked = postgres_search(
+            term_spellings, PDFFile.objects.filter(folder_id__in=folder_ids), limit=limit,
+            min_terms=MIN_TERM_COVERAGE * len(term_spellings),
+        )
+        return [(pdf.id, pdf.rank) for pdf in ranked]
+    return bm25_ranking(query_terms(keywords), folder_ids, limit)
+
+
+# ---------------- Semantic ----------------
+def semantic_ranking(query: str, folder_ids: list, limit: int) -> list:
+    """
+    Rank documents by their best matching chunk. Returns [(pdf_id, distance)].
+    """
+    best = {}
+    for chunk in query_chunks(query, k=limit * CANDIDATE_MULTIPLIER, folder_ids=folder_ids):
+        if chunk["distance"] > SEMANTIC_MAX_DISTANCE:
+            continue
+        pdf_id = chunk["pdf_id"]
+        if pdf_id not in best or chunk["distance"] < best[pdf_id]:
+            best[pdf_id] = chunk["distance"]
+    return sorted(best.items(), key=lambda item: item[1])[:limit]
+
+
+# ---------------- Fusion ----------------
+def reciprocal_rank_fusion(*rankings) -> list:
+    """
+    Merge several [(pdf_id, score)] rankings. Returns [(pdf_id, fused_score)] best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for position, (pdf_id, _) in enumerate(ranking, start=1):
+            fused[pdf_id] = fused.get(pdf_id, 0.0) + 1.0 / (RRF_K + position)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def rank_document_ids(user_query: str, folder_ids: list, top_k: int = None) -> list:
+    """
+    Global top-k over all folder_ids in one pass. Returns [(pdf_id, fused_score)] best first.
+    This is the CPU-heavy part; async callers should run it via sync_to_async.
+    """
+    top_k = top_k or RANKING_TOP_K
+    folder_ids = list(folder_ids)
+    pool = top_k * CANDIDATE_MULTIPLIER
+
+    keywords = extract_query_keywords(user_query)
+    lexical = lexical_ranking(keywords, folder_ids, pool)
+    semantic = semantic_ranking(user_query, folder_ids, pool)
+    fused = reciprocal_rank_fusion(lexical, semantic)[:top_k]
+    print(f"[DEBUG] Ranking terms={query_terms(keywords)} lexical={len(lexical)} semantic={len(semantic)} → {len(fused)} results")
+    return fused
+
+
+def ranked_queryset(fused: list):
+    """
+    PDFFile rows for a fused ranking, with their folder (the full text stays
+    in the database; passages.py reads per-page text instead).
+    """
+    return (
+        PDFFile.objects.filter(id__in=[pdf_id for pdf_id, _ in fused])
+        .select_related("folder")
+        .defer(*PDFFile.TEXT_FIELDS)
+    )
+
+
+def order_ranked(pdfs, fused: list) -> list:
+    """
+    Put fetched PDFs back in ranking order and attach their `score`.
+    """
+    scores = dict(fused)
+    ranked = sorted(pdfs, key=lambda pdf: scores[pdf.id], reverse=True)
+    for pdf in ranked:
+        pdf.score = scores[pdf.id]
+    return ranked
+
@@ -0,0 +1,126 @@
+# registry.py
+"""
+Process-wide registry of heavy models and clients.
+
+Nothing is built at import time: the EasyOCR reader, the YAKE extractors and
+the OpenAI clients are created on first use and then shared by every thread
+of the process (the AsyncOpenAI client by every task of an event loop).
+Workers that never OCR never load EasyOCR. A gunicorn post_fork hook can
+call preload() to warm them up front (see gunicorn.conf.py).
+"""
+import asyncio
+import os
+import threading
+import weakref
+
+from django.conf import settings
+
+OCR_LANGUAGES = ['en', 'mr']
+OCR_USE_GPU = getattr(settings, "OCR_USE_GPU", False)
+YAKE_NGRAM_SIZE = 2
+YAKE_TOP = 100000
+
+_lock = threading.Lock()
+_ocr_reader = None
+_openai_client = None
+_async_openai_clients = weakref.WeakKeyDictionary()  # event loop → AsyncOpenAI
+_keyword_extractors = {}
+
+
+# ---------------- EasyOCR Reader ----------------
+def get_ocr_reader():
+    """
+    English + Marathi EasyOCR reader, loaded once per process.
+    """
+    global _ocr_reader
+    if _ocr_reader is None:
+        with _lock:
+            if _ocr_reader is None:
+                import easyocr
+                print("[🖼] Loading EasyOCR reader...")
+                _ocr_reader = easyocr.Reader(OCR_LANGUAGES, gpu=OCR_USE_GPU)
+    return _ocr_reader
+
+
+# ---------------- YAKE Extractors ----------------
+def get_keyword_extractor(lang_code: str = "en"):
+    """
+    One YAKE extractor per language, reused across calls.
+    """
+    extractor = _keyword_extractors.get(lang_code)
+    if extractor is None:
+        with _lock:
+            extractor = _keyword_extractors.get(lang_code)
+            if extractor is None:
+                import yake
+                extractor = yake.KeywordExtractor(lan=lang_code, n=YAKE_NGRAM_SIZE, top=YAKE_TOP)
+                _keyword_extractors[lang_code] = extractor
+    return extractor
+
+
+# ---------------- OpenAI Client ----------------
+def get_openai_api_key():
+    return getattr(settings, "OPENAI_API_KEY", None) or os.getenv("OPENAI_API_KEY")
+
+
+def get_openai_client():
+    """
+    Shared OpenAI client, or None when no API key is configured.
+    """
+    global _openai_client
+    if _openai_client is None:
+        api_key = get_openai_api_key()
+        if not api_key:
+            return None
+        with _lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                _openai_client = OpenAI(api_key=api_key)
+                print("[🔑] OpenAI API Key loaded: Yes")
+    return _openai_client
+
+
+def get_async_openai_client():
+    """
+    AsyncOpenAI client for streaming / async views, shared per event loop, or
+    None without an API key. Its connection pool is bound to the loop that
+    first used it, and async_to_sync runs each async view under WSGI in a loop
+    of its own, so one process-wide client would be reused on closed loops.
+    Under ASGI workers (start.sh, docker-compose.yml) each worker has one loop,
+    so its client and connections serve every request.
+    """
+    api_key = get_openai_api_key()
+    if not api_key:
+        return None
+    from openai import AsyncOpenAI
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return AsyncOpenAI(api_key=api_key)  # no loop to share it with
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        client = _async_openai_clients[loop] = AsyncOpenAI(api_key=api_key)
+    return client
+
+
+# ---------------- Preloading ----------------
+LOADERS = {
+    "ocr": get_ocr_reader,
+    "yake": lambda: [get_keyword_extractor(lang) for lang in ("en", "mr")],
+    "openai": get_openai_client,  # AsyncOpenAI clients are per event loop, made on first use
+}
+
+
+def preload(names=None) -> None:
+    """
+    Eagerly build the given models ("ocr", "yake", "openai"; default: all).
+    """
+    for name in names or LOADERS:
+        loader = LOADERS.get(name)
+        if loader is None:
+            print(f"[⚠️] Unknown model to preload: {name}")
+            continue
+        try:
+            loader()
+        except Exception as e:
+            print(f"[❌] Preloading {name} failed: {e}")
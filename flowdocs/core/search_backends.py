@@ -0,0 +1,114 @@
+# search_backends.py
+"""
+Lexical search engines for core/ranking.py.
+
+- "python":   BM25 over the Posting index (works everywhere)
+- "postgres": ranked full-text search on PDFFile.search_vector (GIN indexed),
+              with the same minimum share of query terms per hit as BM25
+- "auto":     postgres when the default database is PostgreSQL, python otherwise
+"""
+from functools import reduce
+from operator import add, or_
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, TextField, Value, When
+from django.db.models.functions import Cast, Coalesce, Substr
+
+from .models import PDFFile, PDFPage
+
+SEARCH_BACKEND = getattr(settings, "SEARCH_BACKEND", "auto")
+SEARCH_FTS_CONFIG = getattr(settings, "SEARCH_FTS_CONFIG", "simple")  # no Marathi dictionary in PostgreSQL
+SEARCH_MAX_RESULTS = getattr(settings, "SEARCH_MAX_RESULTS", 5)
+
+# PostgreSQL rejects tsvectors over 1MB, so very long documents are truncated.
+SEARCH_VECTOR_MAX_CHARS = 300000
+
+
+def is_postgres() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def get_search_engine() -> str:
+    """
+    Resolve settings.SEARCH_BACKEND, falling back to the in-Python engine off PostgreSQL.
+    """
+    engine = SEARCH_BACKEND
+    if engine == "auto":
+        return "postgres" if is_postgres() else "python"
+    if engine == "postgres" and not is_postgres():
+        print("[⚠️] Postgres search backend requested but database is not PostgreSQL, using python engine")
+        return "python"
+    return engine
+
+
+# ---------------- Maintaining the tsvector ----------------
+def page_search_text():
+    """
+    The search_text of a PDF's pages, joined in page order (correlated subquery).
+    """
+    # needs psycopg at import time, which SQLite installs lack
+    from django.contrib.postgres.aggregates import StringAgg
+
+    pages = (
+        PDFPage.objects.filter(pdf=OuterRef("pk"))
+        .order_by()
+        .values("pdf")
+        .annotate(joined=StringAgg("search_text", delimiter="\n", ordering="number"))
+        .values("joined")
+    )
+    return Coalesce(Subquery(pages, output_field=TextField()), Value(""))
+
+
+def search_vector_expression():
+    return (
+        SearchVector("title", weight="A", config=SEARCH_FTS_CONFIG)
+        + SearchVector(Cast("keywords", TextField()), weight="B", config=SEARCH_FTS_CONFIG)
+        # the transliterated/folded body, so Latin queries also match Devanagari text
+        + SearchVector(Substr(page_search_text(), 1, SEARCH_VECTOR_MAX_CHARS), weight="C", config=SEARCH_FTS_CONFIG)
+    )
+
+
+def update_search_vector(pdf_ids) -> None:
+    """
+    Recompute search_vector inside the database for the given PDF ids.
+    No-op on SQLite.
+    """
+    if not is_postgres():
+        return
+    PDFFile.objects.filter(pk__in=list(pdf_ids)).update(search_vector=search_vector_expression())
+
+
+# ---------------- Ranked retrieval ----------------
+def postgres_search(term_spellings: list, pdf_files, limit: int = None, min_terms: float = 0) -> list:
+    """
+    Rank pdf_files with SearchRank against an OR of the query terms, each
+    term matching in any of its spellings (see query_term_spellings()).
+    Documents matching fewer than min_terms of the terms are dropped, as
+    MIN_TERM_COVERAGE does for BM25 (core/ranking.py).
+    Returns PDFFile objects carrying `rank`; the document text never
+    leaves the database.
+    """
+    if not term_spellings:
+        return []
+
+    limit = limit or SEARCH_MAX_RESULTS
+    term_queries = [
+        reduce(or_, [SearchQuery(spelling, config=SEARCH_FTS_CONFIG) for spelling in spellings])
+        for spellings in term_spellings
+    ]
+    query = reduce(or_, term_queries)
+    matched_terms = reduce(add, [
+        Case(When(search_vector=term_query, then=Value(1)), default=Value(0), output_field=IntegerField())
+        for term_query in term_queries
+    ])
+    return list(
+        pdf_files
+        .filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query), matched_terms=matched_terms)
+        .filter(matched_terms__gte=min_terms)
+        .defer(*PDFFile.TEXT_FIELDS)
+        .select_related("folder")
+        .order_by("-rank")[:limit]
+    )
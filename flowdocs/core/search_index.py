@@ -0,0 +1,83 @@
+# search_index.py
+"""
+Inverted keyword index over the PDF text (PDFPage rows) and PDFFile.keywords.
+
+Each (term, pdf) pair is stored once in the Posting table together with its
+term frequency, so a query only touches the postings of its own terms
+instead of scanning every document's text.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from .models import PDFFile, Posting
+from .text import normalize_term, tokenize
+
+POSTING_BATCH_SIZE = 2000
+
+
+# ---------------- Building ----------------
+def build_postings(text: str, keywords: list) -> tuple:
+    """
+    Return (term_frequencies, keyword_terms, token_count) for one document.
+    """
+    term_freqs = Counter(tokenize(text))
+    keyword_terms = set()
+    for kw in keywords or []:
+        keyword_terms.update(tokenize(kw))
+    # Keywords extracted from OCR/YAKE may contain terms the text tokenizer
+    # never saw; make sure they are still reachable.
+    for term in keyword_terms:
+        term_freqs.setdefault(term, 1)
+    return term_freqs, keyword_terms, sum(term_freqs.values())
+
+
+@transaction.atomic
+def index_pdf(pdf: PDFFile, text: str = None) -> int:
+    """
+    Replace the postings of a single PDFFile. Returns the number of postings written.
+    text defaults to pdf.text (read from its pages).
+    """
+    text = pdf.text if text is None else text
+    term_freqs, keyword_terms, token_count = build_postings(text, pdf.keywords)
+
+    Posting.objects.filter(pdf_id=pdf.pk).delete()
+    Posting.objects.bulk_create(
+        [
+            Posting(term=term, pdf_id=pdf.pk, tf=tf, in_keywords=term in keyword_terms)
+            for term, tf in term_freqs.items()
+        ],
+        batch_size=POSTING_BATCH_SIZE,
+    )
+    # queryset update: do not re-trigger the post_save indexing signal
+    PDFFile.objects.filter(pk=pdf.pk).update(token_count=token_count)
+    pdf.token_count = token_count
+    return len(term_freqs)
+
+
+# ---------------- Lookup ----------------
+def query_terms(keywords: list) -> list:
+    """
+    Normalize query keywords (possibly multi-word) into distinct index terms.
+    """
+    terms = []
+    for kw in keywords:
+        for term in tokenize(kw):
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+
+def query_term_spellings(keywords: list) -> list:
+    """
+    [[term, spelling, ...]] per query_terms() term: the index term plus the
+    case-folded original spellings that normalize to it (non-Latin words),
+    for matching fields that are not transliterated (PostgreSQL title/keywords).
+    """
+    spellings = {term: [term] for term in query_terms(keywords)}
+    for kw in keywords:
+        for raw in kw.casefold().split():
+            term = normalize_term(raw)
+            if raw != term and term in spellings and raw not in spellings[term]:
+                spellings[term].append(raw)
+    return list(spellings.values())
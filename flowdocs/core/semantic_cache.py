@@ -0,0 +1,111 @@
+# semantic_cache.py
+"""
+Semantic answer cache: reuse LLM answers for near-duplicate questions.
+
+Every answered question is embedded with the MiniLM model from vectorstore.py
+and stored in its own Chroma collection together with the answer, the folder
+set it was searched in, one flag per referenced PDF and one per searched
+folder. A new question that is close enough (cosine similarity) to a stored
+one, searched over the same folders, gets the stored answer back without an
+LLM call. Entries are dropped as soon as the text, keywords or title of a
+referenced PDFFile change, or it is deleted, and when a PDF in a searched
+folder gains or changes text.
+"""
+import json
+
+from django.conf import settings
+
+from .answer_cache import is_cacheable
+from .vectorstore import get_collection
+
+SEMANTIC_CACHE_ENABLED = getattr(settings, "SEMANTIC_CACHE_ENABLED", True)
+SEMANTIC_CACHE_MIN_SIMILARITY = getattr(settings, "SEMANTIC_CACHE_MIN_SIMILARITY", 0.92)
+COLLECTION_NAME = "answer_cache"
+
+
+def get_answer_collection():
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    return get_collection(COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+
+
+def folder_key(folder_ids) -> str:
+    return ",".join(str(folder_id) for folder_id in sorted(set(folder_ids)))
+
+
+def pdf_flag(pdf_id) -> str:
+    return f"pdf_{pdf_id}"
+
+
+def folder_flag(folder_id) -> str:
+    return f"folder_{folder_id}"
+
+
+def lookup(query: str, folder_ids) -> dict:
+    """
+    Return the stored result of the most similar earlier question searched
+    over the same folders, or None.
+    """
+    collection = get_answer_collection()
+    if collection is None or not query.strip():
+        return None
+
+    try:
+        result = collection.query(
+            query_texts=[query], n_results=1, where={"folders": folder_key(folder_ids)}
+        )
+    except Exception as e:
+        print(f"[❌] Semantic cache lookup failed: {e}")
+        return None
+
+    if not result["ids"] or not result["ids"][0]:
+        return None
+
+    similarity = 1 - result["distances"][0][0]
+    if similarity < SEMANTIC_CACHE_MIN_SIMILARITY:
+        return None
+
+    print(f"[♻️] Semantic cache hit ({similarity:.3f}): {result['documents'][0][0]!r}")
+    return json.loads(result["metadatas"][0][0]["result"])
+
+
+def store(key: str, query: str, folder_ids, result: dict) -> None:
+    """
+    Remember an answered question. key is the exact answer cache key.
+    Only real LLM answers with references are kept, never errors or fallbacks.
+    """
+    collection = get_answer_collection()
+    if collection is None or not is_cacheable(result):
+        return
+
+    metadata = {"folders": folder_key(folder_ids), "result": json.dumps(result, ensure_ascii=False)}
+    for ref in result.get("references", []):
+        if ref.get("id") is not None:
+            metadata[pdf_flag(ref["id"])] = True
+    for folder_id in set(folder_ids):
+        metadata[folder_flag(folder_id)] = True
+
+    try:
+        collection.upsert(ids=[key], documents=[query], metadatas=[metadata])
+    except Exception as e:
+        print(f"[❌] Semantic cache store failed: {e}")
+
+
+def invalidate_pdf(pdf_id) -> None:
+    """
+    Drop every cached answer that referenced this PDF.
+    """
+    collection = get_answer_collection()
+    if collection is None:
+        return
+    collection.delete(where={pdf_flag(pdf_id): True})
+
+
+def invalidate_folder(folder_id) -> None:
+    """
+    Drop every cached answer searched over this folder.
+    """
+    collection = get_answer_collection()
+    if collection is None:
+        return
+    collection.delete(where={folder_flag(folder_id): True})
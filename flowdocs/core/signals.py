@@ -0,0 +1,81 @@
+# signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PDFFile
+
+# char_count is saved whenever core/pages.set_pages() replaced the text
+INDEXED_FIELDS = {"char_count", "keywords"}
+SEARCH_VECTOR_FIELDS = {"title", "char_count", "keywords"}
+# Changes that can make a cached answer or its citations wrong
+ANSWER_FIELDS = {"title", "char_count", "keywords", "folder"}
+
+
+# ---------------- Keep the search indexes in sync ----------------
+@receiver(post_save, sender=PDFFile)
+def update_search_index(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Re-index a PDF whenever its text or keywords are saved, and refresh its
+    PostgreSQL tsvector when the title changes too. Cached answers citing it,
+    or searched over its folder (where it may now match), are dropped on
+    those changes only; a new PDF row has no text yet, and status or file
+    updates do not change what an answer says.
+    Pages and postings are removed together with the PDF through the foreign
+    key cascade. A new row without text or keywords (an upload waiting for
+    ingestion, a restore before its pages exist) is indexed by the save that
+    adds them.
+    """
+    from .search_index import index_pdf
+    from .search_backends import update_search_vector
+
+    if created and not instance.char_count and not instance.keywords:
+        return
+    if update_fields is None or INDEXED_FIELDS.intersection(update_fields):
+        index_pdf(instance)
+    if update_fields is None or SEARCH_VECTOR_FIELDS.intersection(update_fields):
+        update_search_vector([instance.pk])
+    if not created and (update_fields is None or ANSWER_FIELDS.intersection(update_fields)):
+        invalidate_cached_answers(instance.pk)
+        if instance.folder_id is not None:
+            invalidate_folder_answers(instance.folder_id)
+
+
+@receiver(post_delete, sender=PDFFile)
+def delete_vector_chunks(sender, instance, **kwargs):
+    """
+    Drop the PDF's chunks from the Chroma collection.
+    """
+    from .vectorstore import delete_pdf_chunks
+
+    try:
+        delete_pdf_chunks(instance.pk)
+    except Exception as e:
+        print(f"[❌] Failed to delete chunks for PDF {instance.pk}: {e}")
+    invalidate_cached_answers(instance.pk)
+
+
+# ---------------- Answer caches ----------------
+def invalidate_cached_answers(pdf_id):
+    """
+    Forget exact and semantically cached answers that cite this PDF.
+    """
+    from . import answer_cache, semantic_cache
+
+    for cache in (answer_cache, semantic_cache):
+        try:
+            cache.invalidate_pdf(pdf_id)
+        except Exception as e:
+            print(f"[❌] Failed to invalidate cached answers for PDF {pdf_id}: {e}")
+
+
+def invalidate_folder_answers(folder_id):
+    """
+    Forget exact and semantically cached answers searched over this folder.
+    """
+    from . import answer_cache, semantic_cache
+
+    for cache in (answer_cache, semantic_cache):
+        try:
+            cache.invalidate_folder(folder_id)
+        except Exception as e:
+            print(f"[❌] Failed to invalidate cached answers for folder {folder_id}: {e}")
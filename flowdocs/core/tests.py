@@ -1,3 +1,921 @@
-from django.test import TestCase
+import io
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import fitz
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import matcher, optimize
+from .extraction_cache import extract_document
+from .ingest import claim_pdf, enqueue_pdf
+from .keyword_backfill import write_keywords
+from .matcher import KeywordMatcher
+from .models import CustomUser, ExtractionCache, Folder, PDFFile, Posting
+from .pages import set_pages
+from .passages import term_hits, term_matcher
+from .query_analyzer import extract_query_keywords
+from .ranking import bm25_ranking, lexical_ranking, reciprocal_rank_fusion
+from .registry import get_async_openai_client
+from .search_index import query_term_spellings
+from .text import fold, search_form, transliterate
+from .tokens import count_tokens
+from .utils import ANSWER_WORD_LIMIT, MESSAGE_OVERHEAD_TOKENS, OPENAI_MODEL, build_answer_messages, stream_gpt4_answer
+from .vectorstore import CHUNK_CHARS, CHUNK_OVERLAP, chunk_pages, index_pdf_chunks, query_chunks
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "answers": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "answers"},
+}
+
+
+# ---------------- Query counts ----------------
+@override_settings(
+    CACHES=TEST_CACHES,
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",  # no collectstatic manifest
+)
+@mock.patch("core.vectorstore._unavailable", True)  # no Chroma: semantic ranking and cache are skipped
+class QueryCountTests(TestCase):
+    """
+    Views must issue a fixed number of queries however many PDFs they show,
+    i.e. no per-row lookups of folders or uploaders.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        cls.common = Folder.objects.create(name="Common", created_by=cls.admin)
+        cls.other = Folder.objects.create(name="Audit", created_by=cls.admin)
+
+    def add_pdfs(self, folder, count):
+        for i in range(count):
+            uploader = CustomUser.objects.create(username=f"{folder.name}-{i}", role="admin")
+            pdf = PDFFile.objects.create(
+                title=f"Water supply report {i}",
+                file=f"pdfs/report_{folder.id}_{i}.pdf",
+                uploaded_by=uploader,
+                folder=folder,
+                status=PDFFile.STATUS_DONE,
+            )
+            set_pages(pdf, [f"Water supply and drainage budget for ward {i}. " * 20, "Annexure"])
+            pdf.save(update_fields=["page_count", "char_count"])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_dashboard_folders(self):
+        self.add_pdfs(self.common, 3)
+        self.add_pdfs(self.other, 3)
+        # session, user, folders with their PDF counts
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_folder_pdfs(self):
+        self.add_pdfs(self.common, 5)
+        # session, user, folder, PDFs joined with their uploaders
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("dashboard", kwargs={"folder_id": self.common.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Common-4")
+
+    def test_dashboard_folder_pdfs_defers_text(self):
+        self.add_pdfs(self.common, 1)
+        response = self.client.get(reverse("dashboard", kwargs={"folder_id": self.common.id}))
+        pdf = response.context["pdfs"][0]
+        self.assertTrue(set(PDFFile.TEXT_FIELDS) <= pdf.get_deferred_fields())
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="answer")
+    def test_search_query(self, generate):
+        self.add_pdfs(self.common, 5)
+        # folders, session, BM25 (document stats, document frequencies,
+        # postings), ranked PDFs with folders, page texts, session save
+        # (savepoint, update, release)
+        with self.assertNumQueries(10):
+            response = self.client.post(reverse("search_query"), {"query": "water supply budget"})
+        self.assertEqual(response.status_code, 200)
+        references = response.json()["references"]
+        self.assertEqual(len(references), 5)
+        self.assertEqual({ref["folder"] for ref in references}, {"Common"})
+        # only page 1 mentions the query terms; the reference links straight to it
+        citation = references[0]["pages"][0]
+        self.assertEqual([page["page"] for page in references[0]["pages"]], [1])
+        self.assertTrue(citation["url"].endswith("#page=1"))
+        self.assertEqual(references[0]["url"], citation["url"])
+        self.assertIn("Water supply", citation["snippet"])
+        generate.assert_awaited_once()
+
+    def test_delete_folder(self):
+        self.add_pdfs(self.other, 4)
+        with mock.patch("django.db.models.fields.files.FieldFile.delete"):
+            response = self.client.get(reverse("delete_folder", args=[self.other.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(PDFFile.objects.filter(folder_id=self.other.id).exists())
+
+
+# ---------------- Streamed answers ----------------
+class FakeStream:
+    """
+    OpenAI chat completion stream yielding the given delta pieces.
+    """
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.closed = False
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def close(self):
+        self.closed = True
+
+
+def split_words(word_count: int, pieces_per_word: int = 3) -> list:
+    """
+    An answer of word_count words ("w0 w1 ...") cut into pieces in the middle
+    of words, the way the API streams tokens.
+    """
+    pieces = []
+    for i in range(word_count):
+        word = f"{'' if i == 0 else ' '}word{i}"
+        step = -(-len(word) // pieces_per_word)
+        pieces.extend(word[start:start + step] for start in range(0, len(word), step))
+    return pieces
+
+
+class StreamedAnswerTests(SimpleTestCase):
+    def stream(self, pieces) -> tuple:
+        fake = FakeStream(pieces)
+        client = mock.Mock()
+        client.chat.completions.create = mock.AsyncMock(return_value=fake)
+
+        async def collect():
+            return [piece async for piece in stream_gpt4_answer("water supply?", "context")]
+
+        with mock.patch("core.utils.get_async_openai_client", return_value=client):
+            return "".join(async_to_sync(collect)()), fake
+
+    def test_words_split_across_pieces_count_once(self):
+        answer, fake = self.stream(split_words(200))
+        self.assertEqual(answer, "".join(split_words(200)))
+        self.assertEqual(len(answer.split()), 200)
+        self.assertFalse(fake.closed)
+
+    def test_long_answer_is_cut_at_the_limit(self):
+        answer, fake = self.stream(split_words(ANSWER_WORD_LIMIT + 50))
+        self.assertTrue(answer.endswith(f"word{ANSWER_WORD_LIMIT - 1}..."))
+        self.assertEqual(len(answer.split()), ANSWER_WORD_LIMIT)
+        self.assertTrue(fake.closed)
+
+    @override_settings(OPENAI_API_KEY="sk-test")
+    def test_async_client_is_shared_per_event_loop(self):
+        async def two_clients():
+            return get_async_openai_client(), get_async_openai_client()
+
+        first, same = async_to_sync(two_clients)()
+        second, _ = async_to_sync(two_clients)()  # a new loop, as for each async view under WSGI
+        self.assertIs(first, same)
+        self.assertIsNot(first, second)
+
+
+# ---------------- Semantic chunks ----------------
+def matches_where(metadata: dict, where: dict) -> bool:
+    if where is None:
+        return True
+    if "$and" in where:
+        return all(matches_where(metadata, clause) for clause in where["$and"])
+    (field, condition), = where.items()
+    if isinstance(condition, dict):
+        return metadata.get(field) in condition["$in"]
+    return metadata.get(field) == condition
+
+
+class FakeCollection:
+    """
+    In-memory Chroma collection: add / delete / query with metadata filters
+    (equality, $in, $and). Query results come in insertion order.
+    """
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, ids, documents, metadatas):
+        for id_, document, metadata in zip(ids, documents, metadatas):
+            assert id_ not in self.rows, f"duplicate id {id_}"
+            self.rows[id_] = (document, metadata)
+
+    def delete(self, where):
+        self.rows = {id_: row for id_, row in self.rows.items() if not matches_where(row[1], where)}
+
+    def query(self, query_texts, n_results, where=None):
+        rows = [row for row in self.rows.values() if matches_where(row[1], where)][:n_results]
+        return {
+            "documents": [[document for document, _ in rows]],
+            "metadatas": [[metadata for _, metadata in rows]],
+            "distances": [[0.1 * i for i in range(len(rows))]],
+        }
+
+
+class VectorStoreTests(SimpleTestCase):
+    def test_chunks_keep_their_page_and_never_span_pages(self):
+        pages = ["Water supply.\n\nDrainage budget.", "", "Road repair."]
+        self.assertEqual(chunk_pages(pages), [(1, "Water supply.\nDrainage budget."), (3, "Road repair.")])
+
+    def test_paragraphs_are_packed_up_to_the_chunk_size(self):
+        paragraphs = [f"{i}" * 400 for i in range(5)]
+        chunks = chunk_pages(["\n\n".join(paragraphs)])
+        self.assertEqual([text.split("\n") for _, text in chunks], [paragraphs[0:2], paragraphs[2:4], paragraphs[4:]])
+        self.assertTrue(all(len(text) <= CHUNK_CHARS for _, text in chunks))
+
+    def test_overlong_line_is_split_with_overlap(self):
+        line = "".join(chr(ord("a") + i % 26) for i in range(2500))
+        chunks = [text for _, text in chunk_pages([line])]
+        self.assertEqual([len(text) for text in chunks], [1000, 1000, 800])
+        self.assertEqual(chunks[1][:CHUNK_OVERLAP], chunks[0][-CHUNK_OVERLAP:])
+        self.assertEqual(chunks[0] + chunks[1][CHUNK_OVERLAP:] + chunks[2][CHUNK_OVERLAP:], line)
+
+    def test_reindex_replaces_old_chunks(self):
+        collection = FakeCollection()
+        pdf, other = SimpleNamespace(id=1, folder_id=7), SimpleNamespace(id=2, folder_id=None)
+        with mock.patch("core.vectorstore.get_collection", return_value=collection):
+            index_pdf_chunks(other, ["Other document."])
+            self.assertEqual(index_pdf_chunks(pdf, ["Old page one.", "Old page two."]), 2)
+            self.assertEqual(index_pdf_chunks(pdf, ["", "New page two."]), 1)
+
+        self.assertEqual(
+            sorted(collection.rows.values(), key=lambda row: row[1]["pdf_id"]),
+            [
+                ("New page two.", {"pdf_id": 1, "folder_id": 7, "page": 2}),
+                ("Other document.", {"pdf_id": 2, "folder_id": 0, "page": 1}),
+            ],
+        )
+
+    def test_query_chunks_filters_by_pdf_and_folder(self):
+        collection = FakeCollection()
+        with mock.patch("core.vectorstore.get_collection", return_value=collection):
+            index_pdf_chunks(SimpleNamespace(id=1, folder_id=7), ["Water supply."])
+            index_pdf_chunks(SimpleNamespace(id=2, folder_id=8), ["Water tariff.", "Water meters."])
+
+            self.assertEqual(
+                query_chunks("water", pdf_ids=[2], folder_ids=[7, 8]),
+                [
+                    {"pdf_id": 2, "page": 1, "text": "Water tariff.", "distance": 0.0},
+                    {"pdf_id": 2, "page": 2, "text": "Water meters.", "distance": 0.1},
+                ],
+            )
+            self.assertEqual([chunk["pdf_id"] for chunk in query_chunks("water", folder_ids=[7])], [1])
+            self.assertEqual(len(query_chunks("water", k=2)), 2)
+            self.assertEqual(query_chunks("water", pdf_ids=[]), [])
+            self.assertEqual(query_chunks("  "), [])
+
+
+# ---------------- Prompt budget ----------------
+class PromptBudgetTests(SimpleTestCase):
+    question = "What is the water supply budget?"
+    references = [{"title": f"Ward {i} budget", "url": f"/media/pdfs/ward_{i}.pdf"} for i in range(3)]
+
+    def passage_groups(self) -> list:
+        return [
+            (f"Ward {i} budget", [
+                {"text": f"Ward {i} passage {n}: " + " ".join(f"item{i}{n}{w} costs {w} lakh" for w in range(40)),
+                 "page": n + 1, "score": 1.0}
+                for n in range(3)
+            ])
+            for i in range(3)
+        ]
+
+    def prompt_tokens(self, messages) -> int:
+        return sum(count_tokens(m["content"], OPENAI_MODEL) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+    def test_messages_stay_within_budget(self):
+        for budget in (300, 600, 1200, 3000):
+            messages = build_answer_messages(self.question, self.passage_groups(), self.references, budget=budget)
+            self.assertLessEqual(self.prompt_tokens(messages), budget, budget)
+
+    def test_passages_are_dropped_before_references_and_instructions(self):
+        full = build_answer_messages(self.question, self.passage_groups(), self.references, budget=100000)
+        short = build_answer_messages(self.question, self.passage_groups(), self.references, budget=600)
+        self.assertEqual(full[0], short[0])  # the system message is never cut
+        for message in (full, short):
+            user = message[1]["content"]
+            self.assertIn(self.question, user)
+            self.assertIn("Summarize the answer in no more than 300 words.", user)
+            for ref in self.references:
+                self.assertIn(ref["title"], user)
+        self.assertEqual(full[1]["content"].count("passage"), 9)
+        self.assertLess(short[1]["content"].count("passage"), 9)
+        # the best passage of each document is kept first (round-robin by rank)
+        self.assertIn("Ward 0 passage 0", short[1]["content"])
+
+    def test_no_room_for_passages(self):
+        system_msg, user = [m["content"] for m in build_answer_messages(
+            self.question, self.passage_groups(), self.references, budget=10
+        )]
+        self.assertNotIn("passage", user)
+        self.assertIn(self.references[0]["title"], user)
+
+
+# ---------------- Answer cache ----------------
+async def read_stream(response) -> bytes:
+    return b"".join([chunk async for chunk in response.streaming_content])
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+)
+@mock.patch("core.vectorstore._unavailable", True)
+class AnswerCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        cls.common = Folder.objects.create(name="Common", created_by=cls.admin)
+        cls.pdf = PDFFile.objects.create(
+            title="Water supply report", file="pdfs/water.pdf", uploaded_by=cls.admin,
+            folder=cls.common, status=PDFFile.STATUS_DONE,
+        )
+        set_pages(cls.pdf, ["Water supply and drainage budget for the ward."])
+        cls.pdf.save(update_fields=["page_count", "char_count"])
+
+    def setUp(self):
+        caches["answers"].clear()
+        self.client.force_login(self.admin)
+
+    def ask(self, path="search_query", query="water supply budget"):
+        response = self.client.post(reverse(path), {"query": query})
+        if response.streaming:
+            response.content_bytes = async_to_sync(read_stream)(response)
+        return response
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="[OpenAI Error] timeout")
+    def test_error_answers_are_not_cached(self, generate):
+        self.ask()
+        self.ask()
+        self.assertEqual(generate.await_count, 2)
+
+    def test_streamed_error_answers_are_not_cached(self):
+        calls = []
+
+        async def failing_stream(query, context, references):
+            calls.append(query)
+            yield "[OpenAI Error] timeout"
+
+        with mock.patch("core.views.stream_gpt4_answer", failing_stream):
+            self.ask("search_stream")
+            self.ask("search_stream")
+        self.assertEqual(len(calls), 2)
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="answer")
+    def test_answers_are_cached(self, generate):
+        self.ask()
+        self.ask()
+        self.assertEqual(generate.await_count, 1)
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="answer")
+    def test_changed_pdf_invalidates_exact_answers(self, generate):
+        self.ask()
+        self.pdf.title = "Water supply report 2025"
+        self.pdf.save(update_fields=["title"])
+        self.ask()
+        self.assertEqual(generate.await_count, 2)
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="answer")
+    def test_new_pdf_in_folder_invalidates_exact_answers(self, generate):
+        self.ask()
+        pdf = PDFFile.objects.create(
+            title="Water supply tariff", file="pdfs/tariff.pdf", uploaded_by=self.admin,
+            folder=self.common, status=PDFFile.STATUS_DONE,
+        )
+        set_pages(pdf, ["Water supply tariff and budget."])
+        pdf.save(update_fields=["page_count", "char_count"])
+        response = self.ask()
+        self.assertEqual(generate.await_count, 2)
+        self.assertIn(pdf.pk, [ref["id"] for ref in response.json()["references"]])
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="answer")
+    def test_keyword_backfill_invalidates_exact_answers(self, generate):
+        self.ask()
+        self.assertEqual(write_keywords([(self.pdf.pk, ["water supply"], 40)]), (1, 0))
+        self.ask()
+        self.assertEqual(generate.await_count, 2)
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="answer")
+    def test_deleted_pdf_invalidates_exact_answers(self, generate):
+        self.ask()
+        self.pdf.delete()
+        response = self.ask()
+        self.assertEqual(response.json()["references"], [])
+
+    @mock.patch("core.views.agenerate_gpt4_answer", new_callable=mock.AsyncMock, return_value="answer")
+    def test_no_match_answers_are_not_cached(self, generate):
+        for path in ("search_query", "search_stream"):
+            caches["answers"].clear()
+            title = f"Property tax assessment ({path})"
+            query = f"property tax assessment {path.replace('_', ' ')}"
+            self.ask(path, query)
+
+            pdf = PDFFile.objects.create(
+                title=title, file=f"pdfs/{path}.pdf", uploaded_by=self.admin,
+                folder=self.common, status=PDFFile.STATUS_DONE,
+            )
+            set_pages(pdf, [f"{title}: rates and due dates."])
+            pdf.save(update_fields=["page_count", "char_count"])
+
+            response = self.ask(path, query)
+            body = response.content_bytes.decode() if response.streaming else response.content.decode()
+            self.assertIn(title, body, path)
+
+    @mock.patch("core.semantic_cache.invalidate_pdf")
+    def test_only_content_changes_invalidate(self, invalidate):
+        pdf = PDFFile.objects.create(title="Circular", file="pdfs/circular.pdf", uploaded_by=self.admin)
+        pdf.status = PDFFile.STATUS_PROCESSING
+        pdf.save(update_fields=["status"])
+        invalidate.assert_not_called()
+
+        pdf.keywords = ["water"]
+        pdf.save(update_fields=["keywords"])
+        invalidate.assert_called_once_with(pdf.pk)
+
+
+# ---------------- Ranking ----------------
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        cls.common = Folder.objects.create(name="Common", created_by=cls.admin)
+        cls.other = Folder.objects.create(name="Audit", created_by=cls.admin)
+        cls.budget = cls.add_pdf("Ward budget", "Water supply budget: water supply hours and the water budget.")
+        cls.drainage = cls.add_pdf("Drainage", "Water drainage works along the main road.")
+        cls.roads = cls.add_pdf("Roads", "Road repair schedule for the monsoon.")
+        cls.audit = cls.add_pdf("Audit", "Water supply budget audit.", folder=cls.other)
+
+    @classmethod
+    def add_pdf(cls, title, text, folder=None):
+        pdf = PDFFile.objects.create(
+            title=title, file=f"pdfs/{title}.pdf", uploaded_by=cls.admin, folder=folder or cls.common,
+            status=PDFFile.STATUS_DONE,
+        )
+        set_pages(pdf, [text])
+        pdf.save(update_fields=["page_count", "char_count"])
+        return pdf
+
+    def test_bm25_ranks_by_relevance_within_folders(self):
+        ranked = bm25_ranking(["water", "supply", "budget"], [self.common.id], 10)
+        self.assertEqual([pdf_id for pdf_id, _ in ranked], [self.budget.id, self.drainage.id])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+
+    def test_bm25_drops_documents_below_term_coverage(self):
+        # 1 of 4 terms is under MIN_TERM_COVERAGE (0.3)
+        ranked = bm25_ranking(["water", "supply", "budget", "tariff"], [self.common.id], 10)
+        self.assertEqual([pdf_id for pdf_id, _ in ranked], [self.budget.id])
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([(1, 9.0), (2, 5.0)], [(2, 0.1), (3, 0.2)])
+        self.assertEqual([pdf_id for pdf_id, _ in fused], [2, 1, 3])
+        self.assertAlmostEqual(fused[0][1], 1 / 62 + 1 / 61)
+
+    def test_postings_follow_saves_and_deletes(self):
+        set_pages(self.roads, ["Bridge inspection"])
+        self.roads.save(update_fields=["page_count", "char_count"])
+        terms = set(Posting.objects.filter(pdf=self.roads).values_list("term", flat=True))
+        self.assertEqual(terms, {"bridge", "inspection"})
+        self.assertEqual(PDFFile.objects.get(pk=self.roads.pk).token_count, 2)
+
+        roads_id = self.roads.id
+        self.roads.delete()
+        self.assertFalse(Posting.objects.filter(pdf_id=roads_id).exists())
+
+    def test_query_term_spellings_group_scripts(self):
+        self.assertEqual(query_term_spellings(["पाणी पुरवठा", "water"]), [["pani", "पाणी"], ["puravatha", "पुरवठा"], ["water"]])
+
+
+@skipUnless(connection.vendor == "postgresql", "PostgreSQL full-text search")
+class PostgresRankingTests(RankingTests):
+    def test_search_vector_ranking_within_folders(self):
+        ranked = lexical_ranking(["water", "supply", "budget"], [self.common.id], 10)
+        self.assertEqual([pdf_id for pdf_id, _ in ranked], [self.budget.id, self.drainage.id])
+
+    def test_search_vector_drops_documents_below_term_coverage(self):
+        ranked = lexical_ranking(["water", "supply", "budget", "tariff"], [self.common.id], 10)
+        self.assertEqual([pdf_id for pdf_id, _ in ranked], [self.budget.id])
+
+
+# ---------------- Media serving ----------------
+class MediaServingTests(TestCase):
+    content = bytes(range(256)) * 40
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        cls.pdf = PDFFile.objects.create(
+            title="Circular", file="pdfs/circular.pdf", uploaded_by=cls.admin, content_hash="ab" * 32
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        (Path(media_root) / "pdfs").mkdir()
+        (Path(media_root) / "pdfs" / "circular.pdf").write_bytes(self.content)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = "/media/pdfs/circular.pdf"
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["ETag"], f'"{"ab" * 32}"')
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+
+    def test_byte_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.content)}")
+        self.assertEqual(b"".join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.content)}")
+
+    def test_stale_if_range_sends_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{"ab" * 32}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], f'"{"ab" * 32}"')
+
+    def test_versioned_url_is_immutable(self):
+        from .media import media_url
+
+        url = media_url(self.pdf)
+        self.assertEqual(url, f"{self.url}?v={'ab' * 8}")
+        response = self.client.get(url)
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_short_version_prefix_is_not_immutable(self):
+        for version in ("a", "ab", "ab" * 4, "ab" * 32):
+            response = self.client.get(self.url, {"v": version})
+            self.assertEqual(response["Cache-Control"], "public, no-cache", version)
+
+    def test_optimized_copy_is_served_by_default(self):
+        optimized = Path(self.pdf.file.storage.location) / "pdfs" / "optimized"
+        optimized.mkdir()
+        (optimized / "circular.pdf").write_bytes(self.content[:100])
+        PDFFile.objects.filter(pk=self.pdf.pk).update(optimized_file="pdfs/optimized/circular.pdf", optimized_hash="cd" * 32)
+        self.pdf.refresh_from_db()
+
+        self.assertEqual(self.pdf.web_url, f"/media/pdfs/optimized/circular.pdf?v={'cd' * 8}")
+        response = self.client.get(self.pdf.web_url)
+        self.assertEqual(b"".join(response.streaming_content), self.content[:100])
+        self.assertEqual(response["ETag"], f'"{"cd" * 32}"')
+
+    def test_path_outside_media_root(self):
+        response = self.client.get("/media/pdfs/..%2F..%2Fmanage.py")
+        self.assertEqual(response.status_code, 404)
+
+
+# ---------------- Web-optimized copies ----------------
+class OptimizeTests(TestCase):
+    content = b"%PDF-1.4 " + b"x" * 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        cls.pdf = PDFFile.objects.create(title="Circular", file="pdfs/circular.pdf", uploaded_by=cls.admin)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        (Path(media_root) / "pdfs").mkdir()
+        (Path(media_root) / "pdfs" / "circular.pdf").write_bytes(self.content)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def optimize(self, size: int, linearized: bool) -> bool:
+        def fake_optimize(input_path, output_path):
+            Path(output_path).write_bytes(b"y" * size)
+            return linearized
+
+        with mock.patch("core.optimize.optimize_pdf", fake_optimize):
+            return optimize.optimize_pdf_file(self.pdf)
+
+    def test_smaller_copy_is_kept(self):
+        self.assertTrue(self.optimize(400, linearized=False))
+        pdf = PDFFile.objects.get(pk=self.pdf.pk)
+        self.assertEqual((pdf.original_size, pdf.optimized_size), (len(self.content), 400))
+        self.assertEqual(pdf.optimized_file.read(), b"y" * 400)
+        self.assertEqual(len(pdf.optimized_hash), 64)
+
+    def test_larger_copy_is_dropped(self):
+        self.assertFalse(self.optimize(len(self.content) + 1, linearized=True))
+        self.assertFalse(PDFFile.objects.get(pk=self.pdf.pk).optimized_file)
+
+    def test_same_size_copy_is_kept_only_when_linearized(self):
+        self.assertFalse(self.optimize(len(self.content), linearized=False))
+        self.assertTrue(self.optimize(len(self.content), linearized=True))
+
+    @mock.patch("core.optimize._linear_supported", True)
+    def test_save_errors_do_not_disable_linearization(self):
+        doc = mock.Mock()
+        doc.save.side_effect = OSError("No space left on device")
+        with self.assertRaises(OSError):
+            optimize.save_optimized(doc, "/tmp/out.pdf")
+        self.assertTrue(optimize._linear_supported)
+
+        doc.save.side_effect = [RuntimeError("code=4: Linearisation is no longer supported"), None]
+        self.assertFalse(optimize.save_optimized(doc, "/tmp/out.pdf"))
+        self.assertFalse(optimize._linear_supported)
+        self.assertEqual(doc.save.call_args.kwargs, {"garbage": 4, "deflate": True})
+
+
+# ---------------- Ingestion queue ----------------
+class IngestQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        cls.pdfs = {
+            status: PDFFile.objects.create(title=status, file=f"pdfs/{status}.pdf", uploaded_by=cls.admin, status=status)
+            for status in (PDFFile.STATUS_PENDING, PDFFile.STATUS_PROCESSING, PDFFile.STATUS_DONE, PDFFile.STATUS_FAILED)
+        }
+
+    def test_claim_once(self):
+        pdf = self.pdfs[PDFFile.STATUS_PENDING]
+        self.assertTrue(claim_pdf(pdf.pk))
+        self.assertFalse(claim_pdf(pdf.pk))
+        self.assertFalse(claim_pdf(self.pdfs[PDFFile.STATUS_DONE].pk))
+
+    def ingested(self, *args) -> set:
+        with mock.patch("core.management.commands.ingest_pending_pdfs.ingest_pdf") as ingest:
+            call_command("ingest_pending_pdfs", *args, stdout=mock.Mock())
+        return {call.args[0] for call in ingest.call_args_list}
+
+    def test_requeues_pending_and_stalled(self):
+        self.assertEqual(
+            self.ingested(), {self.pdfs[PDFFile.STATUS_PENDING].pk, self.pdfs[PDFFile.STATUS_PROCESSING].pk}
+        )
+
+    def test_retries_failed(self):
+        self.assertIn(self.pdfs[PDFFile.STATUS_FAILED].pk, self.ingested("--failed"))
+
+    def test_keep_processing(self):
+        self.assertEqual(self.ingested("--keep-processing"), {self.pdfs[PDFFile.STATUS_PENDING].pk})
+
+    @mock.patch("core.ingest.INGEST_BACKEND", "worker")
+    def test_worker_backend_leaves_uploads_to_the_ingest_process(self):
+        with mock.patch("core.ingest.ingest_pdf") as ingest, self.captureOnCommitCallbacks(execute=True):
+            enqueue_pdf(self.pdfs[PDFFile.STATUS_PENDING])
+        ingest.assert_not_called()
+
+
+# ---------------- Bulk ingestion ----------------
+def write_pdf(path: Path, text: str) -> None:
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+@mock.patch("core.vectorstore._unavailable", True)
+class BulkIngestTests(TransactionTestCase):
+    """
+    TransactionTestCase: the command commits each batch and closes the
+    database connections before forking its workers.
+    """
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        self.folder = Folder.objects.create(name="Audit", created_by=self.admin)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.directory = Path(media_root) / "pdfs"
+        self.directory.mkdir()
+        write_pdf(self.directory / "water_supply.pdf", "Water supply budget for the ward")
+        write_pdf(self.directory / "property_tax.pdf", "Property tax assessment rates")
+
+    def ingest(self, *args) -> str:
+        out = io.StringIO()
+        call_command(
+            "bulk_ingest_pdfs", str(self.directory), "--folder-id", str(self.folder.id),
+            "--workers", "1", "--batch-size", "1", *args, stdout=out,
+        )
+        return out.getvalue()
+
+    @mock.patch("core.management.commands.bulk_ingest_pdfs.invalidate_folder_answers")
+    def test_second_run_ingests_nothing(self, invalidate):
+        self.ingest("--skip-keywords")
+        self.assertEqual(PDFFile.objects.filter(status=PDFFile.STATUS_DONE).count(), 2)
+        # one committed, checkpointed batch per file
+        checkpoint = (self.directory / ".bulk_ingest_checkpoint").read_text().splitlines()
+        self.assertEqual(sorted(checkpoint), ["property_tax.pdf", "water_supply.pdf"])
+        self.assertEqual(invalidate.call_args_list, [mock.call(self.folder.id)] * 2)
+
+        invalidate.reset_mock()
+        self.assertIn("2 already done, 0 to ingest", self.ingest("--skip-keywords"))
+        self.assertEqual(PDFFile.objects.count(), 2)
+        invalidate.assert_not_called()
+
+    def test_restart_skips_known_files(self):
+        self.ingest("--skip-keywords")
+        self.assertIn("0 PDFs restored, 2 skipped", self.ingest("--skip-keywords", "--restart"))
+        self.assertEqual(PDFFile.objects.count(), 2)
+
+    def test_copies_of_known_files_are_skipped(self):
+        self.ingest("--skip-keywords")
+        shutil.copy(self.directory / "water_supply.pdf", self.directory / "water_supply_copy.pdf")
+        self.assertIn("0 PDFs restored, 1 skipped", self.ingest("--skip-keywords"))
+
+    def test_keywords_are_written_back_to_the_extraction_cache(self):
+        self.ingest("--skip-keywords")
+        self.assertFalse(ExtractionCache.objects.exclude(keywords=None).exists())
+
+        PDFFile.objects.all().delete()
+        self.ingest("--restart")
+        self.assertEqual(ExtractionCache.objects.exclude(keywords=None).count(), 2)
+        self.assertTrue(all(pdf.keywords for pdf in PDFFile.objects.all()))
+
+
+# ---------------- Restore commands ----------------
+@mock.patch("core.vectorstore._unavailable", True)
+class RestorePdfsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username="admin", role="superadmin")
+        cls.folder = Folder.objects.create(name="Audit", created_by=cls.admin)
+
+    def setUp(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        # the commands read media/pdfs relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(workdir)
+        settings_override = override_settings(MEDIA_ROOT=str(Path(workdir) / "uploads"))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Path("media/pdfs").mkdir(parents=True)
+        write_pdf(Path("media/pdfs/water_supply.pdf"), "Water supply budget for the ward")
+
+    def test_restore_indexes_each_pdf_once(self):
+        for command in ("restore_pdfs", "restore_pdfs_simple"):
+            PDFFile.objects.all().delete()
+            with mock.patch("core.search_index.index_pdf") as index_pdf, \
+                    mock.patch(f"core.management.commands.{command}.index_pdf_chunks") as index_chunks:
+                call_command(command, "--folder-id", str(self.folder.id), stdout=io.StringIO())
+
+            pdf = PDFFile.objects.get()
+            self.assertEqual(index_pdf.call_count, 1, command)
+            self.assertEqual(pdf.pages.get().text, "Water supply budget for the ward")
+            index_chunks.assert_called_once_with(pdf, ["Water supply budget for the ward"])
+
+
+# ---------------- Extraction cache ----------------
+class ExtractionCacheTests(TestCase):
+    def setUp(self):
+        handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        handle.write(b"%PDF-1.4 scanned annexure")
+        handle.close()
+        self.addCleanup(Path(handle.name).unlink)
+        self.path = handle.name
+
+    def extract(self, ocr_failed_pages):
+        pages = (["Ward budget", ""], [2], ocr_failed_pages)
+        with mock.patch("core.utils.read_pdf_pages", return_value=pages) as read:
+            entry = extract_document(self.path, with_keywords=False)
+        return entry, read
+
+    def test_failed_ocr_is_not_cached(self):
+        entry, _ = self.extract([2])
+        self.assertEqual(entry.ocr_failed_pages, [2])
+        self.assertFalse(ExtractionCache.objects.exists())
+
+        # the scanned page is OCR'd again on the next attempt
+        _, read = self.extract([])
+        read.assert_called_once()
+        self.assertTrue(ExtractionCache.objects.exists())
+
+    def test_ocr_without_text_is_cached(self):
+        self.extract([])
+        _, read = self.extract([])
+        read.assert_not_called()
+
+
+# ---------------- Keyword matching ----------------
+def brute_force_scan(patterns: dict, text: str) -> dict:
+    hits = {}
+    for keyword, keyword_patterns in patterns.items():
+        starts = [
+            start
+            for pattern in set(keyword_patterns)
+            for start in range(len(text) - len(pattern) + 1)
+            if text.startswith(pattern, start)
+        ]
+        if starts:
+            hits[keyword] = [len(starts), min(starts)]
+    return hits
+
+
+class KeywordMatcherTests(SimpleTestCase):
+    def assert_matches_brute_force(self):
+        rng = random.Random(17)
+        for _ in range(300):
+            patterns = {
+                f"kw{i}": ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 2))]
+                for i in range(rng.randint(1, 6))
+            }
+            text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 60)))
+            self.assertEqual(KeywordMatcher(patterns).scan(text), brute_force_scan(patterns, text), (patterns, text))
+
+    def test_python_automaton_matches_brute_force(self):
+        with mock.patch.object(matcher, "ahocorasick", None):
+            self.assert_matches_brute_force()
+
+    def test_native_automaton_matches_brute_force(self):
+        if matcher.ahocorasick is None:
+            self.skipTest("pyahocorasick is not installed")
+        self.assert_matches_brute_force()
+
+    def test_term_hits_whole_words_across_scripts(self):
+        text = "पाणी पुरवठा. Paniwala Pani tax"
+        hits = term_hits(text, term_matcher(["pani", "tax"]))
+        self.assertEqual(hits, [(0, "pani"), (text.index("Pani "), "pani"), (text.index("tax"), "tax")])
+
+    def test_term_hits_skips_pages_without_terms(self):
+        with mock.patch("core.passages.aligned_search_form") as align:
+            self.assertEqual(term_hits("Drainage budget", term_matcher(["pani"]), "drainage budget"), [])
+        align.assert_not_called()
+
+
+# ---------------- Text normalization ----------------
+class TextNormalizationTests(SimpleTestCase):
+    def test_transliterate(self):
+        cases = {
+            "पाणी": "pani",
+            "नगर": "nagar",        # silent word-final schwa
+            "पत्र": "patra",       # kept after a conjunct
+            "न": "na",             # and in one-letter words
+            "शाळा": "shala",
+            "ज़मीन": "zamin",      # nukta
+            "संपर्क": "sanparka",  # anusvara as "n"
+            "कॉलेज": "kolej",
+            "१२३": "123",
+        }
+        for devanagari, latin in cases.items():
+            self.assertEqual(transliterate(devanagari), latin, devanagari)
+
+    def test_transliterate_keeps_other_text(self):
+        self.assertEqual(transliterate("Ward 5 पाणी पट्टी."), "Ward 5 pani patti.")
+        self.assertEqual(transliterate(""), "")
+
+    def test_fold(self):
+        self.assertEqual(fold("Pāṇī STRASSE Straße"), "pani strasse strasse")
+
+    def test_search_form_matches_across_scripts(self):
+        self.assertEqual(search_form("पाणी"), search_form("Pani"))
+        self.assertEqual(search_form("पाणी"), search_form("pāṇī"))
+        self.assertEqual(search_form("पाणी पुरवठा, Ward 5"), "pani puravatha, ward 5")
+
+
+# ---------------- Query analysis ----------------
+class QueryAnalyzerTests(SimpleTestCase):
+    def test_english_question_keeps_romanized_marathi_collisions(self):
+        self.assertEqual(
+            extract_query_keywords("What is the PAN card process?"),
+            ["pan", "card", "process", "pan card", "card process"],
+        )
+        self.assertIn("jar", extract_query_keywords("jar file upload"))
+
+    def test_romanized_marathi_question_drops_marathi_stopwords(self):
+        self.assertEqual(
+            extract_query_keywords("property tax kuthe bharaycha ahe"),
+            ["property", "tax", "property tax", "bharaycha"],
+        )
+
+    def test_devanagari_question_drops_marathi_stopwords(self):
+        self.assertEqual(
+            extract_query_keywords("पण पाणी पट्टी कुठे भरायची आहे?"),
+            ["पाणी", "पट्टी", "पाणी पट्टी", "भरायची"],
+        )
+
+    def test_only_stopwords_keeps_the_words(self):
+        self.assertEqual(extract_query_keywords("what is this?"), ["what", "is", "this", "what is", "is this"])
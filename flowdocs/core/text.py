@@ -0,0 +1,145 @@
+# text.py
+"""
+Shared text analysis used by both the search index and query-time matching,
+so document terms and query terms are normalized the same way.
+
+Terms are script-insensitive: Devanagari is transliterated to plain Latin and
+everything is case- and diacritic-folded, so "पाणी", "Pani" and "pāṇī" all
+index and look up as "pani".
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+# Word characters plus the Devanagari block (matras and virama are not \w),
+# excluding the danda / double danda punctuation marks.
+TOKEN_RE = re.compile(r"(?:[^\W_]|[\u0900-\u0963\u0966-\u097F])+")
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 100
+
+
+# ---------------- Devanagari → Latin ----------------
+# A loose, ASCII-only scheme meant for matching rather than display: vowel
+# length and retroflex/dental pairs collapse, as they do in how people type
+# Marathi words in English ("pani", "nagar", "shala").
+INDEPENDENT_VOWELS = {
+    "अ": "a", "आ": "a", "इ": "i", "ई": "i", "उ": "u", "ऊ": "u", "ऋ": "ru",
+    "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au", "ऑ": "o", "ॲ": "a", "ऍ": "e",
+}
+VOWEL_SIGNS = {
+    "ा": "a", "ि": "i", "ी": "i", "ु": "u", "ू": "u", "ृ": "ru",
+    "े": "e", "ै": "ai", "ो": "o", "ौ": "au", "ॉ": "o", "ॅ": "e",
+}
+CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ल": "l", "व": "v", "श": "sh",
+    "ष": "sh", "स": "s", "ह": "h", "ळ": "l",
+    "क़": "k", "ख़": "kh", "ग़": "g", "ज़": "z", "ड़": "r", "ढ़": "rh", "फ़": "f", "य़": "y",
+}
+NUKTA_FORMS = {"ज": "z", "फ": "f", "ड": "r", "ढ": "rh"}
+SIGNS = {"ं": "n", "ँ": "n", "ः": "h", "ऽ": "", "।": ".", "॥": "."}
+VIRAMA = "्"
+NUKTA = "़"
+DIGITS = {chr(0x0966 + i): str(i) for i in range(10)}
+
+DEVANAGARI_RUN_RE = re.compile(r"[\u0900-\u097F\u200c\u200d]+")
+
+
+def _transliterate_run(run: str) -> str:
+    out = []
+    pending_a = False      # last consonant still carries its inherent "a"
+    conjunct = False       # last consonant was preceded by a virama
+    previous = ""
+    for ch in run:
+        if ch in ("\u200c", "\u200d"):
+            continue
+        if ch == NUKTA:
+            if previous in NUKTA_FORMS and out:
+                out[-1] = NUKTA_FORMS[previous]
+            continue
+        if ch in VOWEL_SIGNS:
+            out.append(VOWEL_SIGNS[ch])
+            pending_a = False
+        elif ch == VIRAMA:
+            pending_a = False
+        else:
+            if pending_a:
+                out.append("a")
+                pending_a = False
+            if ch in CONSONANTS:
+                conjunct = previous == VIRAMA
+                out.append(CONSONANTS[ch])
+                pending_a = True
+            elif ch in INDEPENDENT_VOWELS:
+                out.append(INDEPENDENT_VOWELS[ch])
+            elif ch in SIGNS:
+                out.append(SIGNS[ch])
+            elif ch in DIGITS:
+                out.append(DIGITS[ch])
+        previous = ch
+    # Word-final schwa is silent ("नगर" → "nagar"), except after a conjunct
+    # ("पत्र" → "patra") or in a one-letter word ("न" → "na").
+    if pending_a and (conjunct or len(out) == 1):
+        out.append("a")
+    return "".join(out)
+
+
+def transliterate(text: str) -> str:
+    """
+    Replace Devanagari words with their Latin transliteration; other text is kept.
+    """
+    if not text:
+        return ""
+    return DEVANAGARI_RUN_RE.sub(lambda m: _transliterate_run(m.group()), text)
+
+
+def fold(text: str) -> str:
+    """
+    Case-fold and strip Latin diacritics ("Pāṇī" → "pani").
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in text if not "\u0300" <= ch <= "\u036f")
+
+
+def search_form(text: str) -> str:
+    """
+    Transliterated and folded text: the form documents and queries are matched in.
+    """
+    return fold(transliterate(text))
+
+
+@lru_cache(maxsize=65536)  # document vocabularies repeat heavily
+def normalize_term(term: str) -> str:
+    """
+    Normalize a single term for indexing / lookup.
+    """
+    if term.isascii():
+        return term.casefold().strip()
+    return search_form(term).strip()
+
+
+def words(text: str) -> list:
+    """
+    Split text into case-folded words in their original script.
+    """
+    if not text:
+        return []
+    return [word.casefold() for word in TOKEN_RE.findall(text)]
+
+
+def is_indexable(term: str) -> bool:
+    return MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH
+
+
+def tokenize(text: str) -> list:
+    """
+    Split text into normalized terms, dropping very short or oversized tokens.
+    """
+    if not text:
+        return []
+    return [tok for tok in (normalize_term(t) for t in TOKEN_RE.findall(text)) if is_indexable(tok)]
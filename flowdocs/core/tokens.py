@@ -0,0 +1,64 @@
+# tokens.py
+"""
+Local token counting for prompt budgets.
+
+Uses tiktoken (the OpenAI models' own tokenizer) when it is installed and its
+encoding can be loaded; otherwise falls back to an estimate that errs on the
+high side for Devanagari, which takes far more tokens per character than
+English.
+"""
+from functools import lru_cache
+
+DEFAULT_ENCODING = "o200k_base"   # GPT-4o / GPT-5 family
+CHARS_PER_TOKEN_ASCII = 4
+CHARS_PER_TOKEN_OTHER = 2
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = None):
+    """
+    The tiktoken encoding for model, or None when tiktoken is unavailable.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+    except KeyError:
+        # model newer than the installed tiktoken
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        print(f"[⚠️] tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars // CHARS_PER_TOKEN_ASCII + (len(text) - ascii_chars) // CHARS_PER_TOKEN_OTHER + 1
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = None) -> str:
+    """
+    Cut text to at most max_tokens tokens.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = get_encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    # shrink proportionally until the estimate fits
+    while text and estimate_tokens(text) > max_tokens:
+        text = text[:int(len(text) * max_tokens / estimate_tokens(text) * 0.95)]
+    return text
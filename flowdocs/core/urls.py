@@ -1,7 +1,8 @@
-from django.urls import path, include
-from . import views
+import re
+
+from django.urls import path, re_path, include
+from . import views, media
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     # Root URL now goes directly to search
@@ -30,7 +31,9 @@ urlpatterns = [
 
     # Search (also accessible via /search/)
     path('search/', views.search_query, name='search_query'),
+    path('search/stream/', views.search_stream, name='search_stream'),
     path('add-subcategory/', views.add_subcategory, name='add_subcategory'),
-]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Uploaded PDFs, with byte ranges and ETag revalidation (core/media.py)
+    re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$", media.serve_media, name='media'),
+]
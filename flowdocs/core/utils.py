@@ -1,83 +1,92 @@
 import os
 import fitz  # PyMuPDF
-import easyocr
-import yake
-from openai import OpenAI
 from langdetect import detect, DetectorFactory, LangDetectException
 from django.conf import settings
 
+from .registry import get_keyword_extractor, get_openai_client, get_async_openai_client
+
 # ---------------- Seed for consistent language detection ----------------
 DetectorFactory.seed = 0
 
-# ---------------- OpenAI Setup ----------------
-client = None
-OPENAI_API_KEY = getattr(settings, "OPENAI_API_KEY", None) or os.getenv("OPENAI_API_KEY")
-if OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    print(f"[🔑] OpenAI API Key loaded: Yes")
-else:
-    print("[❌] OpenAI API key not found")
-
-# ---------------- EasyOCR Reader ----------------
-# Initialize once (English + Marathi)
-easyocr_reader = easyocr.Reader(['en', 'mr'], gpu=False)  # Set gpu=True if GPU is available
+# EasyOCR reader, YAKE extractors and the OpenAI client are created lazily
+# by core/registry.py on first use instead of at import time.
 
 # ---------------- PDF Text Extraction ----------------
-def extract_text_from_pdf(file_path: str) -> str:
+def read_pdf_pages(file_path: str) -> tuple:
     """
-    Extract text from PDF using PyMuPDF.
-    Falls back to EasyOCR if no text is found.
+    Extract text page by page using PyMuPDF.
+    Pages without a text layer are rendered and sent to the OCR worker pool
+    (core/ocr.py), so mixed PDFs keep their text pages and only scanned pages
+    pay for OCR. Returns (pages, ocr_page_numbers, ocr_failed_page_numbers):
+    one string per page, in page order (empty for pages that yielded nothing),
+    the 1-based numbers of the pages that went through OCR, and of those
+    whose OCR failed (as opposed to finding no text).
     """
+    from .ocr import ocr_pages
+
     if not os.path.exists(file_path):
         print(f"[❌] File not found: {file_path}")
-        return ""
+        return [], [], []
 
-    text = ""
+    pages, scanned, failed = [], [], []
     try:
         print(f"[📄] Opening PDF with PyMuPDF: {file_path}")
         doc = fitz.open(file_path)
-        for i, page in enumerate(doc, start=1):
-            page_text = page.get_text("text")
-            if page_text.strip():
-                text += page_text + "\n"
-            else:
-                print(f"[⚠️] Page {i} has no text, will use OCR later")
-        doc.close()
-    except Exception as e:
-        print(f"[❌] PyMuPDF extraction failed: {e}")
-        text = ""
-
-    # If no text extracted → try OCR
-    if not text.strip():
-        print("[🖼] No text found in PDF, using EasyOCR...")
         try:
-            result = easyocr_reader.readtext(file_path, detail=0)
-            text = "\n".join(result)
-            print(f"[🖼] OCR extracted {len(text)} chars")
-        except Exception as e:
-            print(f"[❌] EasyOCR failed: {e}")
-            text = ""
+            for i, page in enumerate(doc, start=1):
+                page_text = page.get_text("text").strip()
+                if not page_text:
+                    scanned.append(i)
+                pages.append(page_text)
+
+            if scanned:
+                print(f"[🖼] {len(scanned)} of {len(pages)} pages have no text, queueing for OCR...")
+                try:
+                    for number, page_text in ocr_pages(doc, scanned).items():
+                        if page_text is None:
+                            failed.append(number)
+                        else:
+                            pages[number - 1] = page_text.strip()
+                except Exception as e:
+                    # keep the text layer of the other pages
+                    print(f"[❌] EasyOCR failed: {e}")
+                    failed = list(scanned)
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"[❌] PDF extraction failed: {e}")
+        pages, scanned, failed = [], [], []
 
-    print(f"[✅] Final extracted text length: {len(text)} chars")
-    return text.strip()
+    return pages, scanned, failed
 
 # ---------------- Keyword Extraction ----------------
-def extract_keywords(text: str) -> list:
+LANGUAGE_SAMPLE_CHARS = 5000  # langdetect is just as sure after a few pages
+
+
+def keyword_language(text: str) -> str:
+    """
+    YAKE language for a text: 'mr' or 'en' (the default for anything else).
+    Only a bounded sample is inspected, so long documents cost the same.
+    """
+    try:
+        lang_code = detect(text[:LANGUAGE_SAMPLE_CHARS])
+    except LangDetectException:
+        return 'en'
+    return lang_code if lang_code in ['en', 'mr'] else 'en'
+
+
+def extract_keywords(text: str, lang_code: str = None) -> list:
     """
     Extract all possible keywords using YAKE.
+    lang_code skips language detection when the caller already knows it.
     """
     if not text.strip():
         return []
 
-    try:
-        lang_code = detect(text)
-        if lang_code not in ['en', 'mr']:
-            lang_code = 'en'
-    except LangDetectException:
-        lang_code = 'en'
+    lang_code = lang_code or keyword_language(text)
 
     try:
-        kw_extractor = yake.KeywordExtractor(lan=lang_code, n=2, top=100000)
+        kw_extractor = get_keyword_extractor(lang_code)
         keywords_with_scores = kw_extractor.extract_keywords(text)
         keywords = list(set([kw.lower() for kw, _ in keywords_with_scores]))
         return keywords
@@ -86,152 +95,246 @@ def extract_keywords(text: str) -> list:
         return []
 
 # ---------------- GPT-4 Answer Generation ----------------
-def generate_gpt4_answer(user_question: str, context: str, references: list = None) -> str:
+OPENAI_MODEL = "gpt-5"   # 🔹 you’re already using GPT-5
+ANSWER_WORD_LIMIT = 300
+NO_API_KEY_MESSAGE = "OpenAI API key not configured. Set OPENAI_API_KEY to enable AI responses."
+PROMPT_TOKEN_BUDGET = getattr(settings, "PROMPT_TOKEN_BUDGET", 3000)  # input tokens per answer
+MESSAGE_OVERHEAD_TOKENS = 4  # role / separators the chat format adds per message
+
+
+def answer_prompt_parts(user_question: str, references: list = None) -> tuple:
     """
-    Generate GPT-4/5 answer using PDF context and optionally append reference files.
-    Enforces: 
-      - Answer limited to ~300 words
-      - Returns in English or Marathi based on query language
+    (system message, user prompt template with a {context} slot) in English
+    or Marathi based on the query language.
     """
-    if not client:
-        return "OpenAI API key not configured. Set OPENAI_API_KEY to enable AI responses."
+    from .query_analyzer import query_language
 
-    try:
-        lang = detect(user_question)
-    except LangDetectException:
-        lang = "en"
+    # Braces in the question or titles must survive str.format
+    question = user_question.replace("{", "{{").replace("}", "}}")
 
     # Prepare system & user messages
-    if lang == "mr":
+    if query_language(user_question) == "mr":
         system_msg = "तू एक मदत करणारा सहाय्यक आहेस. उत्तर फक्त मराठीत द्या, जास्तीत जास्त 300 शब्दांमध्ये."
-        prompt = (
+        template = (
             f"खाली दिलेल्या PDF संदर्भांचा वापर करून प्रश्नाचे उत्तर द्या.\n\n"
-            f"प्रश्न: {user_question}\n\n"
-            f"संदर्भ:\n{context}\n\n"
+            f"प्रश्न: {question}\n\n"
+            f"संदर्भ:\n{{context}}\n\n"
             f"उत्तर 300 शब्दांपेक्षा जास्त नसावे."
         )
     else:
         system_msg = "You are a helpful assistant. Answer in English only, max 300 words."
-        prompt = (
+        template = (
             f"Using the following PDF references, answer the question in English.\n\n"
-            f"Question: {user_question}\n\n"
-            f"Reference:\n{context}\n\n"
+            f"Question: {question}\n\n"
+            f"Reference:\n{{context}}\n\n"
             f"Summarize the answer in no more than 300 words."
         )
 
     # Add reference list explicitly to the prompt
     if references:
         ref_list = "\n".join([f"- {ref.get('title')} ({ref.get('url')})" for ref in references if ref.get("title")])
-        prompt += f"\n\nAlso, cite these reference files where useful:\n{ref_list}"
+        template += "\n\nAlso, cite these reference files where useful:\n" + ref_list.replace("{", "{{").replace("}", "}}")
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-5",   # 🔹 you’re already using GPT-5
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt},
-            ],
-        
-        )
-
-        answer = response.choices[0].message.content.strip()
-
-        # 🔹 Hard enforce 300-word limit
-        words = answer.split()
-        if len(words) > 300:
-            answer = " ".join(words[:300]) + "..."
+    return system_msg, template
 
-        return answer
 
-    except Exception as e:
-        print(f"[❌] OpenAI API Error: {e}")
-        return f"[OpenAI Error] {str(e)}"
+def build_answer_messages(user_question: str, context, references: list = None, budget: int = PROMPT_TOKEN_BUDGET) -> list:
+    """
+    Build the chat messages for an answer within budget input tokens.
+    The instructions, question and reference list are counted first with the
+    model's tokenizer (core/tokens.py); context fills what is left. context is
+    either passage groups from core/passages.py, taken in relevance order, or
+    a plain string, which is truncated.
+    """
+    from .passages import assemble_context
+    from .tokens import count_tokens, truncate_to_tokens
+
+    system_msg, template = answer_prompt_parts(user_question, references)
+    fixed_tokens = (
+        count_tokens(system_msg, OPENAI_MODEL)
+        + count_tokens(template.format(context=""), OPENAI_MODEL)
+        + 2 * MESSAGE_OVERHEAD_TOKENS
+    )
+    context_budget = max(budget - fixed_tokens, 0)
+
+    if isinstance(context, str):
+        context_text = truncate_to_tokens(context, context_budget, OPENAI_MODEL)
+        passages = 1 if context_text else 0
+    else:
+        context_text, selected = assemble_context(context or [], context_budget)
+        passages = len(selected)
 
+    context_tokens = count_tokens(context_text, OPENAI_MODEL)
+    print(
+        f"[🧮] Prompt tokens: {fixed_tokens + context_tokens} of {budget} "
+        f"(fixed {fixed_tokens}, context {context_tokens} in {passages} passages)"
+    )
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": template.format(context=context_text)},
+    ]
 
-# ---------------- Language Detection ----------------
-def detect_language(text: str) -> str:
-    try:
-        return detect(text)
-    except:
-        return "en"
 
+def log_usage(usage) -> None:
+    if usage is not None:
+        print(f"[🧮] OpenAI usage: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion tokens")
 
-#==============================search_pdfs=========================
 
+def limit_answer_words(answer: str) -> str:
+    """
+    🔹 Hard enforce the 300-word limit on a finished answer.
+    """
+    words = answer.split()
+    if len(words) > ANSWER_WORD_LIMIT:
+        answer = " ".join(words[:ANSWER_WORD_LIMIT]) + "..."
+    return answer
 
-from rapidfuzz import fuzz
 
-# ---------------- Search PDFs ----------------
-def search_pdfs(user_query: str, pdf_files: list, lang_sensitive: bool = False) -> tuple:
+def generate_gpt4_answer(user_question: str, context, references: list = None) -> str:
     """
-    Search PDFs for matches with user query.
-    If lang_sensitive=True, allow matching English query with Marathi PDFs using transliteration/fuzzy matching.
-    Returns (matched_context, matched_files_metadata)
-    matched_files_metadata: list of dicts with title, folder, url, uploaded_at
+    Generate GPT-4/5 answer using PDF context and optionally append reference files.
+    context is passage groups (core/passages.py) or a string; see build_answer_messages.
+    Enforces: 
+      - Answer limited to ~300 words
+      - Returns in English or Marathi based on query language
     """
-    from .utils import extract_text_from_pdf, extract_keywords, transliterate_marathi_to_english
+    client = get_openai_client()
+    if not client:
+        return NO_API_KEY_MESSAGE
 
-    query_keywords = extract_keywords(user_query)
-    print(f"[DEBUG] User Query: {user_query}")
-    print(f"[DEBUG] Extracted Keywords: {query_keywords}")
+    try:
+        response = client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=build_answer_messages(user_question, context, references),
+        )
+        log_usage(response.usage)
 
-    matched_contexts = []
-    matched_files_metadata = []
+        return limit_answer_words(response.choices[0].message.content.strip())
 
-    for pdf in pdf_files:
-        pdf_path = pdf.file.path
-        pdf_name = pdf.file.name
-        print(f"[DEBUG] Checking PDF: {pdf_name}")
+    except Exception as e:
+        print(f"[❌] OpenAI API Error: {e}")
+        return f"[OpenAI Error] {str(e)}"
 
-        try:
-            pdf_text = extract_text_from_pdf(pdf_path)
-        except Exception as e:
-            print(f"[❌] Failed to extract {pdf_name}: {e}")
-            continue
 
-        if not pdf_text.strip():
-            continue
+async def agenerate_gpt4_answer(user_question: str, context, references: list = None) -> str:
+    """
+    Async version of generate_gpt4_answer using AsyncOpenAI, so an async view
+    can await the completion without holding a worker thread.
+    """
+    client = get_async_openai_client()
+    if not client:
+        return NO_API_KEY_MESSAGE
 
-        pdf_text_lower = pdf_text.lower()
-        score = 0
+    try:
+        response = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=build_answer_messages(user_question, context, references),
+        )
+        log_usage(response.usage)
+        return limit_answer_words(response.choices[0].message.content.strip())
 
-        for kw in query_keywords:
-            kw_lower = kw.lower()
+    except Exception as e:
+        print(f"[❌] OpenAI API Error: {e}")
+        return f"[OpenAI Error] {str(e)}"
 
-            # ---------------- Multilingual fuzzy matching ----------------
-            if lang_sensitive:
-                # Try direct match or transliterate Marathi text to English for comparison
-                marathi_translit = transliterate_marathi_to_english(pdf_text_lower)
-                if kw_lower in pdf_text_lower or kw_lower in marathi_translit.lower():
-                    score += 1
-            else:
-                if kw_lower in pdf_text_lower:
-                    score += 1
 
-        match_ratio = score / len(query_keywords) if query_keywords else 0
-        print(f"[DEBUG] → Match ratio for {pdf_name}: {match_ratio:.2f}")
+def count_streamed_words(piece: str, words: int, in_word: bool) -> tuple:
+    """
+    Continue a running word count over the next piece of a streamed answer.
+    Stream deltas are fragments of words, so words are counted where
+    whitespace is followed by non-whitespace, carrying in_word across pieces.
+    Returns (words, in_word, cut): cut is the offset in piece where word
+    ANSWER_WORD_LIMIT + 1 starts, or None while the answer is within the limit.
+    """
+    for offset, ch in enumerate(piece):
+        if ch.isspace():
+            in_word = False
+        elif not in_word:
+            in_word = True
+            words += 1
+            if words > ANSWER_WORD_LIMIT:
+                return words, in_word, offset
+    return words, in_word, None
+
+
+async def stream_gpt4_answer(user_question: str, context, references: list = None):
+    """
+    Async generator yielding answer text as it arrives from the OpenAI stream.
+    The 300-word limit is enforced while streaming: once it is reached the
+    last piece is cut, "..." is yielded and the upstream stream is closed.
+    """
+    client = get_async_openai_client()
+    if not client:
+        yield NO_API_KEY_MESSAGE
+        return
 
-        if match_ratio >= 0.3:
-            snippet = pdf_text[:2000]  # limit context size
-            matched_contexts.append(snippet)
+    try:
+        stream = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=build_answer_messages(user_question, context, references),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        words, in_word = 0, False
+        async for chunk in stream:
+            if not chunk.choices:
+                # the final chunk carries only the usage
+                log_usage(getattr(chunk, "usage", None))
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+
+            words, in_word, cut = count_streamed_words(delta, words, in_word)
+            if cut is not None:
+                # keep only the words that still fit, then stop
+                yield delta[:cut].rstrip() + "..."
+                await stream.close()
+                return
+
+            yield delta
 
-            matched_files_metadata.append({
-                "title": pdf.title,
-                "folder": pdf.folder.name if pdf.folder else None,
-                "url": pdf.file.url if pdf.file else None,
-                "uploaded_at": pdf.uploaded_at.strftime("%Y-%m-%d") if pdf.uploaded_at else None,
-            })
+    except Exception as e:
+        print(f"[❌] OpenAI API Error: {e}")
+        yield f"[OpenAI Error] {str(e)}"
 
-    combined_context = "\n\n".join(matched_contexts) if matched_contexts else ""
-    return combined_context, matched_files_metadata
+
+# ---------------- Language Detection ----------------
+def detect_language(text: str) -> str:
+    try:
+        return detect(text)
+    except:
+        return "en"
 
 
+# ---------------- Reference Metadata ----------------
+def pdf_metadata(pdf, passages: list = None) -> dict:
+    """
+    Reference entry returned to the client for a matched PDF. Given the
+    document's answer passages (core/passages.py) it also lists the cited
+    pages as {page, score, snippet, url}, and url opens the best of them.
+    """
+    from .media import media_url
+    from .passages import page_citations
+
+    url = media_url(pdf)
+    pages = page_citations(passages or [], url)
+    return {
+        "id": pdf.id,
+        "title": pdf.title,
+        "folder": pdf.folder.name if pdf.folder else None,
+        "url": pages[0]["url"] if pages else url,
+        "pages": pages,
+        "uploaded_at": pdf.uploaded_at.strftime("%Y-%m-%d") if pdf.uploaded_at else None,
+    }
+
 
 #===============transaltor================================
 def transliterate_marathi_to_english(text: str) -> str:
     """
-    Simple transliteration placeholder.
-    You can use libraries like `indic-transliteration` for real transliteration.
-    For now, just return text (stub for fuzzy matching enhancement).
+    Transliterate Devanagari (Marathi) words to Latin script; other text is kept.
+    See core/text.py for the scheme.
     """
-    return text  # TODO: replace with actual transliteration logic
+    from .text import transliterate
+
+    return transliterate(text)
@@ -1,17 +1,181 @@
 # vectorstore.py
-import chromadb
-from chromadb.utils import embedding_functions
-
-# Persistent DB (saves on disk)
-client = chromadb.PersistentClient(path="chroma_db")
-
-# Embedding model (you can later switch to OpenAI or local embeddings)
-embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
-)
-
-# Create collection (like a table in SQL)
-pdf_collection = client.get_or_create_collection(
-    name="pdf_chunks",
-    embedding_function=embedding_func
-)
+"""
+Chroma vector store holding paragraph-level chunks of every PDF.
+
+Chunks are written at ingestion time with pdf_id / folder_id / page metadata,
+and search_query pulls the top-k chunks for a question so the LLM only sees
+the most relevant passages instead of the first 2000 characters of each PDF.
+The client and the MiniLM embedding model are created on first use.
+"""
+import re
+import threading
+
+from django.conf import settings
+
+CHROMA_PATH = str(getattr(settings, "CHROMA_PATH", "chroma_db"))
+SEMANTIC_SEARCH_ENABLED = getattr(settings, "SEMANTIC_SEARCH_ENABLED", True)
+SEMANTIC_TOP_K = getattr(settings, "SEMANTIC_TOP_K", 5)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+COLLECTION_NAME = "pdf_chunks"
+
+CHUNK_CHARS = 1000      # target chunk size
+CHUNK_OVERLAP = 150     # carried over when a single paragraph has to be split
+ADD_BATCH_SIZE = 256
+
+_client = None
+_embedding_func = None
+_collections = {}
+_collection_lock = threading.Lock()
+_unavailable = False
+
+
+def get_collection(name: str = COLLECTION_NAME, metadata: dict = None):
+    """
+    Return a persistent collection (pdf_chunks by default) sharing one client
+    and one MiniLM embedding function, or None when Chroma is disabled or
+    cannot be loaded.
+    """
+    global _client, _embedding_func, _unavailable
+    if not SEMANTIC_SEARCH_ENABLED or _unavailable:
+        return None
+    if name not in _collections:
+        with _collection_lock:
+            if name not in _collections:
+                try:
+                    if _client is None:
+                        import chromadb
+                        from chromadb.utils import embedding_functions
+
+                        # Persistent DB (saves on disk)
+                        _client = chromadb.PersistentClient(path=CHROMA_PATH)
+                        _embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
+                            model_name=EMBEDDING_MODEL
+                        )
+                    _collections[name] = _client.get_or_create_collection(
+                        name=name,
+                        embedding_function=_embedding_func,
+                        metadata=metadata,
+                    )
+                except Exception as e:
+                    print(f"[❌] Chroma vector store unavailable: {e}")
+                    _unavailable = True
+                    return None
+    return _collections[name]
+
+
+# ---------------- Chunking ----------------
+def split_long_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> list:
+    """
+    Hard-split a paragraph that is longer than one chunk, with some overlap.
+    """
+    step = max(size - overlap, 1)
+    return [text[i:i + size] for i in range(0, len(text), step) if text[i:i + size].strip()]
+
+
+def split_units(page_text: str) -> list:
+    """
+    Split a page into paragraphs; paragraphs longer than a chunk fall back to
+    lines (PyMuPDF rarely emits blank lines), and overlong lines are hard-split.
+    """
+    units = []
+    for para in re.split(r"\n\s*\n", page_text):
+        para = para.strip()
+        if len(para) <= CHUNK_CHARS:
+            units.append(para)
+            continue
+        for line in para.split("\n"):
+            line = line.strip()
+            units.extend(split_long_text(line) if len(line) > CHUNK_CHARS else [line])
+    return [unit for unit in units if unit]
+
+
+def chunk_pages(pages: list) -> list:
+    """
+    Group each page's paragraphs into chunks of about CHUNK_CHARS.
+    Returns a list of (page_number, text) tuples; chunks never span pages.
+    """
+    chunks = []
+    for page_number, page_text in enumerate(pages, start=1):
+        if not page_text or not page_text.strip():
+            continue
+
+        current = ""
+        for unit in split_units(page_text):
+            if current and len(current) + len(unit) + 1 > CHUNK_CHARS:
+                chunks.append((page_number, current))
+                current = ""
+            current = f"{current}\n{unit}" if current else unit
+        if current:
+            chunks.append((page_number, current))
+    return chunks
+
+
+# ---------------- Indexing ----------------
+def delete_pdf_chunks(pdf_id: int) -> None:
+    collection = get_collection()
+    if collection is None:
+        return
+    collection.delete(where={"pdf_id": pdf_id})
+
+
+def index_pdf_chunks(pdf, pages: list) -> int:
+    """
+    (Re)write the chunks of one PDF. Returns the number of chunks stored.
+    """
+    collection = get_collection()
+    if collection is None:
+        return 0
+
+    collection.delete(where={"pdf_id": pdf.id})
+    chunks = chunk_pages(pages)
+    for start in range(0, len(chunks), ADD_BATCH_SIZE):
+        batch = chunks[start:start + ADD_BATCH_SIZE]
+        collection.add(
+            ids=[f"{pdf.id}-{start + i}" for i in range(len(batch))],
+            documents=[text for _, text in batch],
+            metadatas=[
+                {"pdf_id": pdf.id, "folder_id": pdf.folder_id or 0, "page": page}
+                for page, _ in batch
+            ],
+        )
+    print(f"[🧩] Stored {len(chunks)} chunks for PDF {pdf.id}")
+    return len(chunks)
+
+
+# ---------------- Retrieval ----------------
+def query_chunks(query: str, k: int = SEMANTIC_TOP_K, pdf_ids: list = None, folder_ids: list = None) -> list:
+    """
+    Return the top-k chunks for query as dicts with pdf_id, page, text and distance,
+    optionally restricted to some PDFs and/or folders.
+    """
+    collection = get_collection()
+    if collection is None or not query.strip():
+        return []
+
+    if (pdf_ids is not None and not pdf_ids) or (folder_ids is not None and not folder_ids):
+        return []
+
+    filters = []
+    if pdf_ids is not None:
+        filters.append({"pdf_id": {"$in": list(pdf_ids)}})
+    if folder_ids is not None:
+        filters.append({"folder_id": {"$in": list(folder_ids)}})
+
+    where = None
+    if len(filters) == 1:
+        where = filters[0]
+    elif filters:
+        where = {"$and": filters}
+
+    try:
+        result = collection.query(query_texts=[query], n_results=k, where=where)
+    except Exception as e:
+        print(f"[❌] Chroma query failed: {e}")
+        return []
+
+    return [
+        {"pdf_id": meta["pdf_id"], "page": meta.get("page"), "text": doc, "distance": dist}
+        for doc, meta, dist in zip(
+            result["documents"][0], result["metadatas"][0], result["distances"][0]
+        )
+    ]
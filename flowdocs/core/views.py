@@ -11,7 +11,6 @@ import traceback
 
 from .forms import UploadForm, FolderForm
 from .models import PDFFile, Folder
-from .utils import extract_text_from_pdf, extract_keywords, generate_gpt4_answer
 from langdetect import detect, DetectorFactory
 
 DetectorFactory.seed = 0  # consistent language detection
@@ -80,6 +79,7 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Count
 from .models import Folder, PDFFile
 from .forms import UploadForm
+from .ingest import enqueue_pdf
 
 @login_required(login_url='login')
 def dashboard(request, folder_id=None):
@@ -97,11 +97,18 @@ def dashboard(request, folder_id=None):
                 pdf.folder = folder
                 pdf.uploaded_by = request.user
                 pdf.save()
+                enqueue_pdf(pdf)  # extract text + keywords in the background
                 return redirect('dashboard', folder_id=folder.id)
         else:
             form = UploadForm()
 
-        pdfs = PDFFile.objects.filter(folder=folder).order_by('-uploaded_at')
+        # One joined query for the uploader names; the text columns stay unread
+        pdfs = (
+            PDFFile.objects.filter(folder=folder)
+            .select_related('uploaded_by')
+            .defer(*PDFFile.TEXT_FIELDS)
+            .order_by('-uploaded_at')
+        )
         return render(request, "dashboard_pdfs.html", {
             "folder": folder,
             "pdfs": pdfs,
@@ -155,17 +162,15 @@ def create_folder(request):
 # ---------------- Delete PDF ----------------
 @login_required
 def delete_pdf(request, file_id):
-    pdf = get_object_or_404(PDFFile, pk=file_id)
+    pdf = get_object_or_404(PDFFile.objects.defer(*PDFFile.TEXT_FIELDS), pk=file_id)
 
     # SCGI users can delete only their own uploads; Admin/Superadmin can delete any
-    if request.user.role not in ["admin", "superadmin"] and pdf.uploaded_by != request.user:
+    if request.user.role not in ["admin", "superadmin"] and pdf.uploaded_by_id != request.user.pk:
         messages.error(request, "You don't have permission to delete this PDF.")
         return redirect(request.META.get("HTTP_REFERER", "dashboard"))
 
     try:
-        if pdf.file:
-            pdf.file.delete(save=False)  # delete file from storage
-        pdf.delete()
+        pdf.delete()  # also deletes the file and its optimized copy from storage
         messages.success(request, "PDF deleted successfully.")
     except Exception as e:
         messages.error(request, f"Error deleting PDF: {e}")
@@ -184,10 +189,12 @@ def delete_folder(request, folder_id):
         return redirect("dashboard")
 
     # Delete all files in folder first (DB + storage)
-    pdfs = PDFFile.objects.filter(folder=folder)
+    pdfs = PDFFile.objects.filter(folder=folder).only('id', 'file', 'optimized_file')
     for pdf in pdfs:
         if pdf.file:
             pdf.file.delete(save=False)
+        if pdf.optimized_file:
+            pdf.optimized_file.delete(save=False)
     pdfs.delete()
 
     folder_name = folder.name
@@ -227,96 +234,253 @@ def home_view(request):
 
 
 # ---------------- Search Query ----------------
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponseBadRequest
-from django.core.cache import cache
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 import traceback
 from rapidfuzz import fuzz
 
 from .models import PDFFile, Folder
-from .utils import generate_gpt4_answer, search_pdfs, transliterate_marathi_to_english
+from .utils import agenerate_gpt4_answer, stream_gpt4_answer, pdf_metadata
+from .ranking import rank_document_ids, ranked_queryset, order_ranked
+from .vectorstore import query_chunks
+from .passages import answer_passages
+from .answer_cache import answer_cache_key, aget_answer, aset_answer, is_cacheable
+from . import semantic_cache
 
-CACHE_TTL = 3600  # 1 hour
 CATEGORY_MATCH_THRESHOLD = 75  # fuzzy match % for category detection
+MAX_QUERY_WORDS = 30
+QUERY_TOO_LONG_ANSWER = "--- Your question is too long. Please ask a shorter question with less than 30 words."
+SOMETHING_WRONG_ANSWER = "⚠️ Something went wrong. Please try again later."
+
+# The search views are async: under ASGI (uvicorn workers) one process can
+# hold many in-flight questions that mostly wait on the LLM. Session, user and
+# CPU-bound ranking work is offloaded with sync_to_async.
+
 
-def search_query(request):
+async def resolve_search_folders(request) -> tuple:
+    """
+    Decide which folders this session may search.
+    Returns (is_first_question, categories, folder_ids).
+    """
+    categories = [c async for c in Folder.objects.all().order_by("name")]
+
+    # --- Step 0: Check if this is the first user question ---
+    is_first_question = not await sync_to_async(request.session.get)("asked_first_question", False)
+
+    # --- Step 1: Decide folder(s) to search ---
+    if is_first_question:
+        # First question → only search in common (already loaded above)
+        search_folders = [f for f in categories if f.name.lower() == "common"]
+
+    else:
+        # Follow-up → search across all categories
+        search_folders = categories
+
+    return is_first_question, categories, [folder.id for folder in search_folders]
+
+
+async def find_answer_context(request, query: str, is_first_question: bool, categories: list, folder_ids: list) -> tuple:
+    """
+    Rank PDFs across folder_ids and collect candidate passages for the LLM.
+    Marks the session's first question as asked.
+    Returns (context, references, folder_names, fallback_answer); context is
+    passage groups for build_answer_messages, and fallback_answer
+    is the message to show when nothing matched.
+    """
+    context, matched_pdfs, folder_names, fallback_answer = [], [], "", ""
+
+    # --- Step 2: Rank PDFs across all chosen folder(s) in one pass ---
+    # Index terms are transliterated and folded, so Marathi and English
+    # spellings of the query match the same documents.
+    fused = await sync_to_async(rank_document_ids)(query, folder_ids)
+    if fused:
+        ranked_pdfs = order_ranked([pdf async for pdf in ranked_queryset(fused)], fused)
+        # Retrieval: only the passages around the query terms (plus the
+        # closest semantic chunks) of the top PDFs; the prompt builder fits
+        # them into the token budget, and each reference cites their pages
+        chunks = await sync_to_async(query_chunks)(query, pdf_ids=[pdf.id for pdf in ranked_pdfs])
+        context = await sync_to_async(answer_passages)(query, ranked_pdfs, chunks)
+        matched_pdfs = [pdf_metadata(pdf, passages) for pdf, (_, passages) in zip(ranked_pdfs, context)]
+        folder_names = ", ".join(dict.fromkeys(pdf.folder.name for pdf in ranked_pdfs if pdf.folder))
+
+    # --- Step 3: Handle no matches on first question ---
+    if is_first_question and not matched_pdfs:
+        category_names = ", ".join([c.name for c in categories])
+        fallback_answer = (
+            f"🤖 Sorry, I could not find a matching answer in the common folder.\n"
+            f"📚 You can explore these categories: {category_names}"
+        )
+
+    await mark_first_question_asked(request)
+    return context, matched_pdfs, folder_names, fallback_answer
+
+
+async def lookup_cached_answer(query: str, folder_ids: list, cached_key: str):
+    """
+    Exact cache first, then the semantic cache for reworded questions.
+    A semantic hit is copied under the exact key so the next identical
+    question skips the embedding step too.
+    """
+    cached_result = await aget_answer(cached_key)
+    if cached_result:
+        return cached_result
+
+    cached_result = await sync_to_async(semantic_cache.lookup)(query, folder_ids)
+    if cached_result:
+        await aset_answer(cached_key, cached_result, folder_ids)
+    return cached_result
+
+
+async def store_answer(query: str, folder_ids: list, cached_key: str, result: dict) -> None:
+    """
+    Cache a finished answer under its exact key and in the semantic cache.
+    Error answers and answers citing no PDF are only returned to the user who asked.
+    """
+    if not is_cacheable(result):
+        return
+    await aset_answer(cached_key, result, folder_ids)
+    await sync_to_async(semantic_cache.store)(cached_key, query, folder_ids, result)
+
+
+async def mark_first_question_asked(request) -> None:
+    # --- Step 4: Mark that first question has been asked ---
+    await sync_to_async(request.session.__setitem__)("asked_first_question", True)
+
+
+async def search_query(request):
     if request.method == "GET":
-        categories = Folder.objects.all().order_by("name")
+        categories = [c async for c in Folder.objects.all().order_by("name")]
         welcome_message = " Namaskar, I am your AI assistant. I can help you by answering your questions."
-        return render(request, "search.html", {"welcome_message": welcome_message, "categories": categories})
+        # templates read request.user lazily, which is sync-only
+        return await sync_to_async(render)(request, "search.html", {"welcome_message": welcome_message, "categories": categories})
 
     elif request.method == "POST":
         try:
             query = request.POST.get("query", "").strip()
-            categories = Folder.objects.all().order_by("name")
 
             # Length check
-            if len(query.split()) > 30:
+            if len(query.split()) > MAX_QUERY_WORDS:
                 return JsonResponse({
-                    "answer": "--- Your question is too long. Please ask a shorter question with less than 30 words.",
+                    "answer": QUERY_TOO_LONG_ANSWER,
                     "references": [],
                 })
 
-            user_id = getattr(request.user, "id", "public")
-            cached_key = f"user_{user_id}_query_{hash(query)}"
-            cached_result = cache.get(cached_key)
+            # Shared cache: same (or reworded) question + same searchable folders
+            is_first_question, categories, folder_ids = await resolve_search_folders(request)
+            cached_key = answer_cache_key(query, folder_ids)
+            cached_result = await lookup_cached_answer(query, folder_ids, cached_key)
             if cached_result:
+                await mark_first_question_asked(request)
                 return JsonResponse(cached_result)
 
-            matched_pdfs, answer_text = [], ""
-            query_translit = transliterate_marathi_to_english(query)
-
-            # --- Step 0: Check if this is the first user question ---
-            is_first_question = not request.session.get("asked_first_question", False)
-
-            # --- Step 1: Decide folder(s) to search ---
-            if is_first_question:
-                # First question → only search in common
-                search_folders = Folder.objects.filter(name__iexact="common")
-                
-            else:
-                # Follow-up → search across all categories
-                search_folders = categories
-
-            # --- Step 2: Search PDFs in chosen folder(s) ---
-            for folder in search_folders:
-                pdfs = PDFFile.objects.filter(folder=folder).order_by("-uploaded_at")
-                context, pdf_matches = search_pdfs(query_translit, pdfs, lang_sensitive=True)
-                if pdf_matches:
-                    matched_pdfs.extend(pdf_matches)
-                    prompt = f"User Question: {query}\nContext: {context}"
-                    answer_obj = generate_gpt4_answer(query, prompt, matched_pdfs)
-                    answer_text = (
-                        f"--- Answer from **{folder.name}** folder:\n\n{answer_obj}\n\n--- Hope this helps."
-                    )
-                    break  # Stop after first matched folder
-
-            # --- Step 3: Handle no matches on first question ---
-            if is_first_question and not matched_pdfs:
-                category_names = ", ".join([c.name for c in categories])
+            context, matched_pdfs, folder_names, answer_text = await find_answer_context(
+                request, query, is_first_question, categories, folder_ids
+            )
+            if matched_pdfs:
+                answer_obj = await agenerate_gpt4_answer(query, context, matched_pdfs)
                 answer_text = (
-                    f"🤖 Sorry, I could not find a matching answer in the common folder.\n"
-                    f"📚 You can explore these categories: {category_names}"
+                    f"--- Answer from **{folder_names}** folder:\n\n{answer_obj}\n\n--- Hope this helps."
                 )
 
-            # --- Step 4: Mark that first question has been asked ---
-            request.session["asked_first_question"] = True
-
             # --- Step 5: Cache & respond ---
             result = {"answer": answer_text, "references": matched_pdfs}
-            cache.set(cached_key, result, timeout=CACHE_TTL)
+            await store_answer(query, folder_ids, cached_key, result)
             return JsonResponse(result)
 
         except Exception:
             traceback.print_exc()
             return JsonResponse(
-                {"answer": "⚠️ Something went wrong. Please try again later.", "references": []},
+                {"answer": SOMETHING_WRONG_ANSWER, "references": []},
                 status=500,
             )
 
     return HttpResponseBadRequest("Invalid request")
 
 
+# ---------------- Streaming Search (Server-Sent Events) ----------------
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def event_stream_response(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
+
+
+async def single_answer_events(result: dict):
+    """
+    Replay a finished (cached or canned) answer as a stream.
+    """
+    yield sse_event("references", {"references": result.get("references", [])})
+    yield sse_event("token", {"text": result.get("answer", "")})
+    yield sse_event("done", result)
+
+
+async def search_stream(request):
+    """
+    Same search as search_query, but the answer is streamed as SSE:
+      event: references → sent as soon as ranking is done
+      event: token      → answer text pieces as the LLM produces them
+      event: done       → full answer (also cached)
+    Served under ASGI the stream is an async iterator, so no worker thread is
+    held while the LLM is generating.
+    """
+    if request.method != "POST":
+        return HttpResponseBadRequest("Invalid request")
+
+    try:
+        query = request.POST.get("query", "").strip()
+
+        # Length check
+        if len(query.split()) > MAX_QUERY_WORDS:
+            return event_stream_response(single_answer_events({"answer": QUERY_TOO_LONG_ANSWER, "references": []}))
+
+        is_first_question, categories, folder_ids = await resolve_search_folders(request)
+        cached_key = answer_cache_key(query, folder_ids)
+        cached_result = await lookup_cached_answer(query, folder_ids, cached_key)
+        if cached_result:
+            await mark_first_question_asked(request)
+            return event_stream_response(single_answer_events(cached_result))
+
+        context, matched_pdfs, folder_names, fallback_answer = await find_answer_context(
+            request, query, is_first_question, categories, folder_ids
+        )
+    except Exception:
+        traceback.print_exc()
+        return event_stream_response(single_answer_events({"answer": SOMETHING_WRONG_ANSWER, "references": []}))
+
+    if not matched_pdfs:
+        result = {"answer": fallback_answer, "references": []}
+        await store_answer(query, folder_ids, cached_key, result)
+        return event_stream_response(single_answer_events(result))
+
+    async def answer_events():
+        yield sse_event("references", {"references": matched_pdfs})
+        try:
+            parts = [f"--- Answer from **{folder_names}** folder:\n\n"]
+            yield sse_event("token", {"text": parts[0]})
+
+            async for piece in stream_gpt4_answer(query, context, matched_pdfs):
+                parts.append(piece)
+                yield sse_event("token", {"text": piece})
+
+            parts.append("\n\n--- Hope this helps.")
+            yield sse_event("token", {"text": parts[-1]})
+
+            result = {"answer": "".join(parts), "references": matched_pdfs}
+            await store_answer(query, folder_ids, cached_key, result)
+            yield sse_event("done", result)
+        except Exception:
+            traceback.print_exc()
+            yield sse_event("error", {"answer": SOMETHING_WRONG_ANSWER})
+
+    return event_stream_response(answer_events())
+
+
 
 
 
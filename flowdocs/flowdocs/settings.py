@@ -100,6 +100,17 @@ DATABASES = {
     }
 }
 
+# PostgreSQL (docker-compose provides DB_HOST etc.) enables the full-text search backend
+if os.getenv('DB_HOST'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'flowdocs'),
+        'USER': os.getenv('DB_USER', 'postgres'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,6 +161,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Media is served by core/media.py (Range, ETag, 304). Set to an nginx
+# `internal` location mapped to MEDIA_ROOT to hand the file body to nginx.
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
 
 AUTH_USER_MODEL = 'core.CustomUser'
 # OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -179,6 +193,62 @@ CACHES = {
     }
 }
 
+# Shared answer cache (core/answer_cache.py), visible to every worker.
+# Redis evicts LRU (see maxmemory-policy in docker-compose); the file cache culls when full.
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '3600'))  # seconds
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES['answers'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': ANSWER_CACHE_TTL,
+    }
+else:
+    CACHES['answers'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'answers',
+        'TIMEOUT': ANSWER_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+
+# PDF ingestion pipeline (core/ingest.py)
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))  # background extraction threads per process
+INGEST_ASYNC = os.getenv('INGEST_ASYNC', 'True').lower() == 'true'
+# "threads": each web process ingests its uploads in its own thread pool;
+# "worker": uploads stay pending for one `manage.py ingest_pending_pdfs --watch` process
+INGEST_BACKEND = os.getenv('INGEST_BACKEND', 'threads')
+
+# Web-optimized PDF copies (core/optimize.py): images downsampled, streams deflated
+PDF_OPTIMIZE_ENABLED = os.getenv('PDF_OPTIMIZE_ENABLED', 'True').lower() == 'true'
+PDF_OPTIMIZE_IMAGE_DPI = 150
+PDF_OPTIMIZE_IMAGE_QUALITY = 75
+
+# OCR worker processes for scanned pages (core/ocr.py); 0 = OCR inline.
+# Per ingesting process: with INGEST_BACKEND = "threads" every web worker starts its own pool
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '2'))
+
+# Search backend (core/search_backends.py): "auto", "python" or "postgres"
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+SEARCH_FTS_CONFIG = 'simple'  # PostgreSQL text search config; no Marathi dictionary exists
+SEARCH_MAX_RESULTS = 5
+
+# Semantic retrieval over the Chroma "pdf_chunks" collection (core/vectorstore.py)
+SEMANTIC_SEARCH_ENABLED = os.getenv('SEMANTIC_SEARCH_ENABLED', 'True').lower() == 'true'
+CHROMA_PATH = BASE_DIR / 'chroma_db'
+SEMANTIC_TOP_K = 5  # chunks fetched per question
+SEMANTIC_MAX_DISTANCE = 1.0  # ignore chunks further than this from the question
+
+# Semantic answer cache (core/semantic_cache.py): reuse answers for reworded questions
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'True').lower() == 'true'
+SEMANTIC_CACHE_MIN_SIMILARITY = float(os.getenv('SEMANTIC_CACHE_MIN_SIMILARITY', '0.92'))  # cosine
+
+# Hybrid ranking (core/ranking.py): BM25 + embeddings fused into one global top-k
+RANKING_TOP_K = 5
+
+# Whole answer prompt (instructions + question + references + passages), counted with tiktoken;
+# the best passages of the ranked PDFs (core/passages.py) fill what the rest leaves
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '3000'))
+
 # CORS settings (disabled for now)
 # CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if os.getenv('CORS_ALLOWED_ORIGINS') else []
 
@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings for FlowDocs.
+
+Heavy models (EasyOCR, YAKE, OpenAI client) load lazily on first use. Set
+PRELOAD_MODELS to warm some of them in every worker right after fork instead,
+e.g. PRELOAD_MODELS=yake,openai (or "all"). Leave it unset for workers that
+never OCR, to keep startup fast and memory low.
+"""
+import os
+
+
+def post_fork(server, worker):
+    names = os.getenv("PRELOAD_MODELS", "").strip()
+    if not names:
+        return
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "flowdocs.settings")
+    import django
+    django.setup()
+
+    from core.registry import preload
+    preload(None if names == "all" else [n.strip() for n in names.split(",") if n.strip()])
+    server.log.info("Worker %s preloaded models: %s", worker.pid, names)
@@ -13,6 +13,8 @@ export DJANGO_SETTINGS_MODULE=${DJANGO_SETTINGS_MODULE:-"flowdocs.settings"}
 export OPENAI_API_KEY=${OPENAI_API_KEY:-""}
 export CORS_ALLOWED_ORIGINS=${CORS_ALLOWED_ORIGINS:-""}
 export CSRF_TRUSTED_ORIGINS=${CSRF_TRUSTED_ORIGINS:-""}
+# Uploads are ingested by one dedicated process (below), not by every web worker
+export INGEST_BACKEND=${INGEST_BACKEND:-"worker"}
 
 echo "Environment: SECRET_KEY=${SECRET_KEY:0:10}..., DEBUG=$DEBUG, ALLOWED_HOSTS=$ALLOWED_HOSTS, DJANGO_SETTINGS_MODULE=$DJANGO_SETTINGS_MODULE"
 echo "OpenAI API Key: ${OPENAI_API_KEY:0:20}..." 
@@ -41,6 +43,19 @@ else:
 echo "Collecting static files..."
 cd /app/flowdocs && DJANGO_SETTINGS_MODULE=flowdocs.settings python manage.py collectstatic --noinput --clear || echo "Static files collection failed, continuing..."
 
+# Ingest worker: picks up PDFs queued before this restart and every new upload.
+# The only process that runs OCR, so OCR_WORKERS bounds EasyOCR processes overall.
+echo "Starting PDF ingestion in the background..."
+if [ "$INGEST_BACKEND" = "worker" ]; then
+    (cd /app/flowdocs && while true; do
+        DJANGO_SETTINGS_MODULE=flowdocs.settings python manage.py ingest_pending_pdfs --watch
+        echo "Ingest worker exited, restarting in 5s..."
+        sleep 5
+    done) &
+else
+    (cd /app/flowdocs && DJANGO_SETTINGS_MODULE=flowdocs.settings python manage.py ingest_pending_pdfs || echo "Pending PDF ingestion failed") &
+fi
+
 # Start the application
-echo "Starting Gunicorn server on 0.0.0.0:8000..."
-exec gunicorn --bind 0.0.0.0:8000 --workers 3 --timeout 120 --access-logfile - --error-logfile - flowdocs.wsgi:application
+echo "Starting Gunicorn (uvicorn ASGI workers) on 0.0.0.0:8000..."
+exec gunicorn --config gunicorn.conf.py --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --workers 3 --timeout 120 --access-logfile - --error-logfile - flowdocs.asgi:application